@@ -1,22 +1,85 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import io
 import os
 import re
+import mmap
+import tarfile
 from pathlib import Path
 import datetime
 
-def split_sdf_file(input_file_path, output_base_dir="output", compounds_per_folder=10000):
+# Compiled once: pulls the DATABASE_ID value out of a raw compound block
+# without a Python-level per-line scan.
+_DBID_RE = re.compile(rb"> <DATABASE_ID>[^\S\n]*\n[^\S\n]*(\S+)")
+
+def _block_sample(block, max_lines):
+    """
+    Decode the first max_lines lines of a compound block for error logging
+    """
+    return block.decode('utf-8', errors='replace').splitlines(keepends=True)[:max_lines]
+
+def _iter_compound_blocks(input_file_path):
+    """
+    Generator yielding raw bytes of each $$$$-terminated compound block
+
+    Memory-maps the master SDF and locates the record terminators with
+    mmap.find (a C-level memchr scan) instead of iterating the file line by
+    line in Python. Falls back to buffered line reads if the file cannot be
+    mapped (e.g. an empty file).
+    """
+    with open(input_file_path, 'rb') as file:
+        try:
+            mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Fallback: buffered line iteration (rare; e.g. zero-size files)
+            current_compound = []
+            for line in file:
+                current_compound.append(line)
+                if line.strip() == b"$$$$":
+                    yield b"".join(current_compound)
+                    current_compound = []
+            return
+
+        with mm:
+            size = len(mm)
+            start = 0
+            while start < size:
+                pos = mm.find(b"$$$$", start)
+                if pos == -1:
+                    break
+
+                # The terminator must sit on its own line
+                if pos > 0 and mm[pos - 1:pos] != b"\n":
+                    start = pos + 4
+                    continue
+                line_end = mm.find(b"\n", pos)
+                block_end = size if line_end == -1 else line_end + 1
+                if mm[pos + 4:block_end].strip() != b"":
+                    start = pos + 4
+                    continue
+
+                yield mm[start:block_end]
+                start = block_end
+
+def split_sdf_file(input_file_path, output_base_dir="output", compounds_per_folder=10000,
+                   archive_batches=False):
     """
     Split large SDF file into separate files based on DATABASE_ID
     Organize compounds into folders with maximum compounds_per_folder each
-    
+
+    With archive_batches=True each batch is emitted as a single
+    batch_XXXX.tar archive instead of a folder of loose .sdf files. On
+    cluster / networked storage this collapses millions of inodes (and the
+    metadata operations that dominate transfer time) down to one per batch.
+
     Args:
         input_file_path (str): Path to input SDF file
         output_base_dir (str): Base directory for output
         compounds_per_folder (int): Maximum compounds per folder
+        archive_batches (bool): Pack each batch into a .tar archive
     """
-    
+
     # Create output directory
     output_path = Path(output_base_dir)
     output_path.mkdir(exist_ok=True)
@@ -24,7 +87,6 @@ def split_sdf_file(input_file_path, output_base_dir="output", compounds_per_fold
     # Create error log file
     error_log_path = output_path / "error.log"
     
-    current_compound = []
     compound_count = 0
     folder_count = 1
     current_folder_compounds = 0
@@ -35,102 +97,316 @@ def split_sdf_file(input_file_path, output_base_dir="output", compounds_per_fold
     print(f"Maximum {compounds_per_folder} compounds per folder")
     print(f"Error log file: {error_log_path}")
     
-    # Initialize error log file
-    with open(error_log_path, 'w', encoding='utf-8') as error_log:
-        error_log.write(f"SDF File Processing Error Log\n")
-        error_log.write(f"Start Time: {datetime.datetime.now()}\n")
-        error_log.write(f"Source File: {input_file_path}\n")
-        error_log.write("="*80 + "\n\n")
-    
+    # One buffered handle for the whole run; log_error writes into it
+    # directly instead of re-opening the file per error.
+    error_log = open(error_log_path, 'w', buffering=1 << 16, encoding='utf-8')
+    error_log.write(f"SDF File Processing Error Log\n")
+    error_log.write(f"Start Time: {datetime.datetime.now()}\n")
+    error_log.write(f"Source File: {input_file_path}\n")
+    error_log.write("="*80 + "\n\n")
+
+    current_tar = None
+    current_tar_name = None
     try:
-        with open(input_file_path, 'r', encoding='utf-8') as file:
-            for line_num, line in enumerate(file, 1):
-                current_compound.append(line)
-                
-                # Each compound ends with $$$$
-                if line.strip() == "$$$$":
-                    # Find DATABASE_ID
-                    database_id = extract_database_id(current_compound)
-                    
-                    if database_id:
-                        # Determine folder name
-                        folder_name = f"batch_{folder_count:04d}"
+        line_num = 0
+        for block in _iter_compound_blocks(input_file_path):
+            line_num += block.count(b"\n")
+
+            # Find DATABASE_ID with one C-level regex scan over the block
+            database_id = extract_database_id(block)
+
+            if database_id:
+                # Determine folder name
+                folder_name = f"batch_{folder_count:04d}"
+
+                # Create filename
+                filename = f"{database_id}.sdf"
+
+                # Write compound to file (or append it to the batch archive)
+                try:
+                    if archive_batches:
+                        if current_tar_name != folder_name:
+                            if current_tar is not None:
+                                current_tar.close()
+                            current_tar = tarfile.open(output_path / f"{folder_name}.tar", 'w',
+                                                       bufsize=1 << 20)
+                            current_tar_name = folder_name
+                        member = tarfile.TarInfo(name=filename)
+                        member.size = len(block)
+                        current_tar.addfile(member, io.BytesIO(block))
+                    else:
                         folder_path = output_path / folder_name
                         folder_path.mkdir(exist_ok=True)
-                        
-                        # Create filename
-                        filename = f"{database_id}.sdf"
                         file_path = folder_path / filename
-                        
-                        # Write compound to file
+                        # The block is one contiguous bytes object, so the
+                        # whole compound goes out in a single write syscall
+                        # without the buffered-file layer.
+                        fd = os.open(str(file_path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
                         try:
-                            with open(file_path, 'w', encoding='utf-8') as output_file:
-                                output_file.writelines(current_compound)
-                            
-                            compound_count += 1
+                            os.write(fd, block)
+                        finally:
+                            os.close(fd)
+
+                    compound_count += 1
+                    current_folder_compounds += 1
+
+                    # Progress report
+                    if compound_count % 1000 == 0:
+                        print(f"Processed compounds: {compound_count} | Errors: {error_count}")
+
+                    # Check folder limit
+                    if current_folder_compounds >= compounds_per_folder:
+                        folder_count += 1
+                        current_folder_compounds = 0
+                        print(f"Creating new folder: batch_{folder_count:04d}")
+
+                except Exception as e:
+                    error_count += 1
+                    error_msg = f"File writing error - {filename}: {e}"
+                    print(f"ERROR: {error_msg}")
+                    log_error(error_log, "FILE_WRITE_ERROR", error_msg, line_num,
+                            database_id, _block_sample(block, 5))  # Log first 5 lines
+
+            else:
+                error_count += 1
+                error_msg = f"DATABASE_ID not found (line {line_num})"
+                print(f"ERROR: {error_msg}")
+                log_error(error_log, "DATABASE_ID_NOT_FOUND", error_msg, line_num,
+                        None, _block_sample(block, 10))  # Log first 10 lines
+
+    except FileNotFoundError:
+        error_msg = f"File not found - {input_file_path}"
+        print(f"ERROR: {error_msg}")
+        log_error(error_log, "FILE_NOT_FOUND", error_msg, 0, None, [])
+        return
+    except Exception as e:
+        error_msg = f"File reading error: {e}"
+        print(f"ERROR: {error_msg}")
+        log_error(error_log, "FILE_READ_ERROR", error_msg, 0, None, [])
+        return
+    else:
+        # Add final summary to error log
+        error_log.write(f"\n" + "="*80 + "\n")
+        error_log.write(f"Processing Summary\n")
+        error_log.write(f"End Time: {datetime.datetime.now()}\n")
+        error_log.write(f"Total Processed Compounds: {compound_count}\n")
+        error_log.write(f"Total Errors: {error_count}\n")
+        error_log.write(f"Created Folders: {folder_count}\n")
+    finally:
+        if current_tar is not None:
+            current_tar.close()
+        error_log.close()
+
+    print(f"\nProcessing completed!")
+    print(f"Total processed compounds: {compound_count}")
+    print(f"Total errors: {error_count}")
+    print(f"Created folders: {folder_count}")
+    print(f"Compounds in last folder: {current_folder_compounds}")
+    if error_count > 0:
+        print(f"Error details in: {error_log_path}")
+
+def _filter_block_chunk(args):
+    """
+    Worker: parse a chunk of compound blocks with RDKit and count rotatable bonds
+
+    Args:
+        args (tuple): (blocks, threshold) where blocks is a list of raw block bytes
+
+    Returns:
+        list: (database_id, block, rotatable_bonds, passed) per block
+    """
+    import io
+    from rdkit import Chem
+    from rdkit.Chem import Lipinski
+
+    blocks, threshold = args
+    results = []
+
+    for block in blocks:
+        database_id = extract_database_id(block)
+
+        suppl = Chem.ForwardSDMolSupplier(io.BytesIO(block),
+                                          sanitize=True, removeHs=False)
+        mol = next(suppl, None)
+
+        if mol is None:
+            results.append((database_id, block, -1, False))
+        else:
+            rotatable_bonds = Lipinski.NumRotatableBonds(mol)
+            results.append((database_id, block, rotatable_bonds, rotatable_bonds <= threshold))
+
+    return results
+
+def _read_compound_blocks(file):
+    """
+    Generator yielding one $$$$-terminated compound block at a time
+
+    Expects a binary-mode handle: SDF is ASCII in practice, so reading bytes
+    skips the per-line UTF-8 decode and the blocks stay bytes end to end.
+    """
+    current_compound = []
+    for line in file:
+        current_compound.append(line)
+        if line.strip() == b"$$$$":
+            yield b"".join(current_compound)
+            current_compound = []
+
+def _chunked(iterable, chunk_size):
+    """
+    Generator grouping an iterable into lists of chunk_size items
+    """
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def split_and_filter(input_file_path, output_base_dir="filtered_sdf_files", threshold=15,
+                     compounds_per_folder=10000, num_processes=None, blocks_per_task=256):
+    """
+    Split the master SDF and filter by rotatable bond count in a single pass
+
+    Fuses split_sdf_file and the downstream analyze step: each compound block is
+    parsed exactly once and either written to a batch folder (if it passes the
+    rotatable bond threshold) or dropped, instead of writing every compound to
+    disk and re-reading it for analysis.
+
+    Args:
+        input_file_path (str): Path to input SDF file
+        output_base_dir (str): Base directory for filtered output
+        threshold (int): Maximum allowed rotatable bonds
+        compounds_per_folder (int): Maximum compounds per folder
+        num_processes (int): Worker process count (default: cpu count)
+        blocks_per_task (int): Compound blocks sent to a worker per task
+    """
+    import multiprocessing as mp
+
+    if num_processes is None:
+        num_processes = os.cpu_count() or 1
+
+    output_path = Path(output_base_dir)
+    output_path.mkdir(exist_ok=True)
+    error_log_path = output_path / "error.log"
+
+    compound_count = 0
+    passed_count = 0
+    rejected_count = 0
+    folder_count = 1
+    current_folder_compounds = 0
+    error_count = 0
+
+    print(f"Processing SDF file: {input_file_path}")
+    print(f"Output directory: {output_base_dir}")
+    print(f"Rotatable bond threshold: <= {threshold}")
+    print(f"Maximum {compounds_per_folder} compounds per folder")
+    print(f"Worker processes: {num_processes}")
+
+    error_log = open(error_log_path, 'w', buffering=1 << 16, encoding='utf-8')
+    error_log.write(f"SDF Split+Filter Error Log\n")
+    error_log.write(f"Start Time: {datetime.datetime.now()}\n")
+    error_log.write(f"Source File: {input_file_path}\n")
+    error_log.write("="*80 + "\n\n")
+
+    try:
+        with open(input_file_path, 'rb', buffering=1 << 20) as file:
+            block_chunks = _chunked(_read_compound_blocks(file), blocks_per_task)
+            args_iter = ((chunk, threshold) for chunk in block_chunks)
+
+            with mp.Pool(num_processes) as pool:
+                for chunk_results in pool.imap_unordered(_filter_block_chunk, args_iter):
+                    for database_id, block, rotatable_bonds, passed in chunk_results:
+                        compound_count += 1
+
+                        if database_id is None:
+                            error_count += 1
+                            log_error(error_log, "DATABASE_ID_NOT_FOUND",
+                                      "DATABASE_ID not found", 0, None,
+                                      _block_sample(block, 10))
+                            continue
+
+                        if rotatable_bonds < 0:
+                            error_count += 1
+                            log_error(error_log, "MOLECULE_READ_ERROR",
+                                      f"Molecule could not be parsed - {database_id}", 0,
+                                      database_id, _block_sample(block, 5))
+                            continue
+
+                        if not passed:
+                            rejected_count += 1
+                            continue
+
+                        folder_name = f"batch_{folder_count:04d}"
+                        folder_path = output_path / folder_name
+                        folder_path.mkdir(exist_ok=True)
+
+                        try:
+                            fd = os.open(str(folder_path / f"{database_id}.sdf"),
+                                         os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                            try:
+                                os.write(fd, block)
+                            finally:
+                                os.close(fd)
+
+                            passed_count += 1
                             current_folder_compounds += 1
-                            
-                            # Progress report
-                            if compound_count % 1000 == 0:
-                                print(f"Processed compounds: {compound_count} | Errors: {error_count}")
-                            
-                            # Check folder limit
+
                             if current_folder_compounds >= compounds_per_folder:
                                 folder_count += 1
                                 current_folder_compounds = 0
                                 print(f"Creating new folder: batch_{folder_count:04d}")
-                                
                         except Exception as e:
                             error_count += 1
-                            error_msg = f"File writing error - {filename}: {e}"
+                            error_msg = f"File writing error - {database_id}.sdf: {e}"
                             print(f"ERROR: {error_msg}")
-                            log_error(error_log_path, "FILE_WRITE_ERROR", error_msg, line_num, 
-                                    database_id, current_compound[:5])  # Log first 5 lines
-                    
-                    else:
-                        error_count += 1
-                        error_msg = f"DATABASE_ID not found (line {line_num})"
-                        print(f"ERROR: {error_msg}")
-                        log_error(error_log_path, "DATABASE_ID_NOT_FOUND", error_msg, line_num,
-                                None, current_compound[:10])  # Log first 10 lines
-                    
-                    # Clear for next compound
-                    current_compound = []
-                    
+                            log_error(error_log, "FILE_WRITE_ERROR", error_msg, 0,
+                                      database_id, _block_sample(block, 5))
+
+                        if compound_count % 1000 == 0:
+                            print(f"Processed compounds: {compound_count} | "
+                                  f"Passed: {passed_count} | Rejected: {rejected_count} | Errors: {error_count}")
+
     except FileNotFoundError:
         error_msg = f"File not found - {input_file_path}"
         print(f"ERROR: {error_msg}")
-        log_error(error_log_path, "FILE_NOT_FOUND", error_msg, 0, None, [])
+        log_error(error_log, "FILE_NOT_FOUND", error_msg, 0, None, [])
         return
     except Exception as e:
         error_msg = f"File reading error: {e}"
         print(f"ERROR: {error_msg}")
-        log_error(error_log_path, "FILE_READ_ERROR", error_msg, 0, None, [])
+        log_error(error_log, "FILE_READ_ERROR", error_msg, 0, None, [])
         return
-    
-    # Add final summary to error log
-    with open(error_log_path, 'a', encoding='utf-8') as error_log:
+    else:
         error_log.write(f"\n" + "="*80 + "\n")
         error_log.write(f"Processing Summary\n")
         error_log.write(f"End Time: {datetime.datetime.now()}\n")
         error_log.write(f"Total Processed Compounds: {compound_count}\n")
+        error_log.write(f"Passed (<= {threshold} rot. bonds): {passed_count}\n")
+        error_log.write(f"Rejected (> {threshold} rot. bonds): {rejected_count}\n")
         error_log.write(f"Total Errors: {error_count}\n")
         error_log.write(f"Created Folders: {folder_count}\n")
-    
+    finally:
+        error_log.close()
+
     print(f"\nProcessing completed!")
     print(f"Total processed compounds: {compound_count}")
+    print(f"Passed: {passed_count} | Rejected: {rejected_count}")
     print(f"Total errors: {error_count}")
     print(f"Created folders: {folder_count}")
-    print(f"Compounds in last folder: {current_folder_compounds}")
     if error_count > 0:
         print(f"Error details in: {error_log_path}")
 
-def log_error(error_log_path, error_type, error_message, line_number, database_id, compound_sample):
+def log_error(error_log, error_type, error_message, line_number, database_id, compound_sample):
     """
-    Write error information to log file
-    
+    Write error information to the open error log handle
+
+    The handle stays open for the lifetime of the split run, so each error
+    costs one buffered write instead of an open/append/close cycle.
+
     Args:
-        error_log_path (Path): Path to error log file
+        error_log (file): Open writable handle to the error log
         error_type (str): Type of error
         error_message (str): Error message
         line_number (int): Line number where error occurred
@@ -138,41 +414,42 @@ def log_error(error_log_path, error_type, error_message, line_number, database_i
         compound_sample (list): Sample lines from the compound
     """
     try:
-        with open(error_log_path, 'a', encoding='utf-8') as error_log:
-            error_log.write(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ")
-            error_log.write(f"ERROR TYPE: {error_type}\n")
-            error_log.write(f"MESSAGE: {error_message}\n")
-            error_log.write(f"LINE: {line_number}\n")
-            error_log.write(f"DATABASE_ID: {database_id if database_id else 'Not found'}\n")
-            
-            if compound_sample:
-                error_log.write(f"COMPOUND SAMPLE (first {len(compound_sample)} lines):\n")
-                for i, line in enumerate(compound_sample, 1):
-                    error_log.write(f"  {i:2d}: {line.rstrip()}\n")
-            
-            error_log.write("-" * 40 + "\n\n")
-            
+        error_log.write(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ")
+        error_log.write(f"ERROR TYPE: {error_type}\n")
+        error_log.write(f"MESSAGE: {error_message}\n")
+        error_log.write(f"LINE: {line_number}\n")
+        error_log.write(f"DATABASE_ID: {database_id if database_id else 'Not found'}\n")
+
+        if compound_sample:
+            error_log.write(f"COMPOUND SAMPLE (first {len(compound_sample)} lines):\n")
+            for i, line in enumerate(compound_sample, 1):
+                error_log.write(f"  {i:2d}: {line.rstrip()}\n")
+
+        error_log.write("-" * 40 + "\n\n")
+
     except Exception as e:
         print(f"Error log writing error: {e}")
 
-def extract_database_id(compound_lines):
+def extract_database_id(compound):
     """
-    Extract DATABASE_ID from compound lines
-    
+    Extract DATABASE_ID from a compound block
+
+    A single search with the module-level compiled regex replaces the old
+    per-line strip/compare loop, so the whole block is scanned at C level.
+
     Args:
-        compound_lines (list): All lines of the compound
-        
+        compound (bytes or list): Raw block bytes, or all lines of the compound
+
     Returns:
         str: DATABASE_ID value or None
     """
-    for i, line in enumerate(compound_lines):
-        if line.strip() == "> <DATABASE_ID>":
-            # ID should be in the next line
-            if i + 1 < len(compound_lines):
-                database_id = compound_lines[i + 1].strip()
-                if database_id:
-                    return database_id
-    return None
+    if isinstance(compound, bytes):
+        buf = compound
+    else:
+        buf = "".join(compound).encode('utf-8')
+
+    match = _DBID_RE.search(buf)
+    return match.group(1).decode('utf-8') if match else None
 
 def get_file_info(file_path):
     """
@@ -2,15 +2,42 @@
 # -*- coding: utf-8 -*-
 
 import os
+import sys
+import sqlite3
 import subprocess
 import multiprocessing as mp
-import queue
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 import time
+import json
+import queue
+import signal
 import logging
+import logging.handlers
 from datetime import datetime
 import shutil
 
+# OpenBabel's Python bindings keep 3D generation, minimization and PDBQT
+# export in one process: no fork+exec, and the MMFF94s parameter tables load
+# once per worker instead of once per obabel/obminimize launch. Fall back to
+# the subprocess chain on installs that only ship the command-line tools.
+try:
+    from openbabel import openbabel as ob, pybel
+    HAS_OPENBABEL_BINDINGS = True
+except ImportError:
+    HAS_OPENBABEL_BINDINGS = False
+
+# Meeko replaces the python2 prepare_ligand4.py step: it writes PDBQT
+# in-process from an RDKit mol, avoiding a CPython2 fork plus the MGLTools
+# import per ligand. Optional — the subprocess converters remain as fallback.
+try:
+    from meeko import MoleculePreparation, PDBQTWriterLegacy
+    from rdkit import Chem as _rdchem
+    HAS_MEEKO = True
+except ImportError:
+    HAS_MEEKO = False
+
 # =============================================================================
 # CONFIGURATION SECTION - MODIFY THESE VARIABLES
 # =============================================================================
@@ -65,6 +92,28 @@ AUTO_RUN_MODE = "full"              # Options: "test", "full", "skip_menu"
 RESUME_MODE = True                  # Skip batches that are already completed
 OVERWRITE_EXISTING = False          # Set to True to overwrite existing PDBQT files
 
+# Coalesced output mode: store each batch's PDBQT results as blobs in a single
+# batch.sqlite container instead of one small file per ligand. On cluster
+# filesystems this turns 100k+ per-file metadata transactions per batch into
+# one append-only stream. Recover loose files with:
+#   python sdf_to_pdbqt_converter.py dump-sqlite-to-files <batch.sqlite> <dest_dir>
+ARCHIVE_OUTPUTS = False
+ARCHIVE_INSERT_BATCH = 500          # Blobs buffered per executemany insert
+
+# Wall-clock cap per ligand on the in-process (Python bindings) path. The
+# subprocess chain bounds every stage with its own timeout; this gives the
+# bindings pipeline an equivalent bound so a make3D/minimization call that
+# hangs in native code cannot stall a pool worker forever.
+IN_PROCESS_TIMEOUT_SECONDS = 960
+
+# Below this many files the batch runs in the parent process; pool spawn
+# overhead would exceed the work for a handful of ligands.
+MIN_FILES_FOR_POOL = 32
+
+# Each worker should get at least this many tasks; otherwise the pool is
+# scaled down so spawn + parameter-load cost stays amortized.
+MIN_TASKS_PER_WORKER = 8
+
 # Progress reporting
 PROGRESS_REPORT_FREQUENCY = 100     # Report progress every N files
 SAVE_PROGRESS_LOG = True           # Save detailed progress log for each batch
@@ -76,41 +125,85 @@ SAVE_PROGRESS_LOG = True           # Save detailed progress log for each batch
 def setup_logging(log_dir, batch_name=None):
     """
     Setup logging configuration for specific batch or general processing
+
+    The hot path only appends records to an in-memory queue; a single
+    QueueListener thread does the formatting and file/stream writes, so
+    progress reporting never blocks on handler locks or write() latency.
+
+    Returns: tuple (logger, listener) - call listener.stop() at shutdown
     """
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     if batch_name:
         log_file = log_dir / f"conversion_log_{batch_name}_{timestamp}.log"
     else:
         log_file = log_dir / f"multi_batch_conversion_{timestamp}.log"
-    
+
     # Clear any existing handlers
     for handler in logging.root.handlers[:]:
         logging.root.removeHandler(handler)
-    
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler()
-        ]
-    )
-    return logging.getLogger(__name__)
-
-def check_openbabel():
+
+    # Nothing in the format string uses thread/process attributes, so skip
+    # collecting them per record.
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    file_handler = logging.FileHandler(log_file, delay=True)
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        log_queue, file_handler, stream_handler, respect_handler_level=True)
+    listener.start()
+
+    logging.root.setLevel(logging.INFO)
+    logging.root.addHandler(logging.handlers.QueueHandler(log_queue))
+    return logging.getLogger(__name__), listener
+
+def check_openbabel(cache_dir=None):
     """
     Check if OpenBabel is available for 3D generation and minimization
+
+    A successful probe is cached in cache_dir/.obabel_check.json keyed by
+    the obabel binary's path and mtime, so scheduler-driven restarts skip
+    the fork+exec of `obabel -V` entirely. Failures are never cached.
     """
+    obabel_path = shutil.which('obabel')
+    cache_key = None
+    cache_file = Path(cache_dir) / ".obabel_check.json" if cache_dir else None
+    if obabel_path:
+        try:
+            cache_key = [obabel_path, os.stat(obabel_path).st_mtime_ns]
+        except OSError:
+            cache_key = None
+
+    if cache_file and cache_key:
+        try:
+            cached = json.loads(cache_file.read_text())
+            if cached.get('key') == cache_key and cached.get('ok'):
+                logging.info(f"OpenBabel check cached: {obabel_path}")
+                return True
+        except (OSError, ValueError):
+            pass
+
     try:
         # Use -V for version check, which is more standard and reliable
-        result = subprocess.run(['obabel', '-V'], 
+        result = subprocess.run(['obabel', '-V'],
                               capture_output=True, text=True, timeout=10)
-        
+
         # Combine stdout and stderr to catch version info wherever it's printed
         full_output = (result.stdout.strip() + " " + result.stderr.strip()).strip()
-        
+
         if "Open Babel" in full_output:
             logging.info(f"OpenBabel check successful: {full_output}")
+            if cache_file and cache_key:
+                try:
+                    cache_file.write_text(json.dumps({'key': cache_key, 'ok': True}))
+                except OSError:
+                    pass
             return True
         else:
             # Provide more detailed error info if the check fails
@@ -119,7 +212,7 @@ def check_openbabel():
             logging.error(f"stdout: {result.stdout.strip()}")
             logging.error(f"stderr: {result.stderr.strip()}")
             return False
-            
+
     except (subprocess.TimeoutExpired, FileNotFoundError):
         logging.error("OpenBabel not found. Please install OpenBabel first.")
         logging.error("Installation: conda install -c conda-forge openbabel>=3.1.0")
@@ -134,11 +227,12 @@ def get_batch_folders(input_base_dir):
         logging.error(f"Input directory does not exist: {input_path}")
         return []
     
-    batch_folders = []
-    for item in input_path.iterdir():
-        if item.is_dir() and item.name.startswith('batch_'):
-            batch_folders.append(item)
-    
+    # scandir's DirEntry caches the dirent type, so is_dir() needs no extra
+    # stat and no Path object is built for non-batch entries.
+    with os.scandir(input_path) as it:
+        batch_folders = [input_path / entry.name for entry in it
+                         if entry.name.startswith('batch_') and entry.is_dir()]
+
     return sorted(batch_folders)
 
 def check_batch_completion(batch_folder, output_base_dir):
@@ -149,11 +243,26 @@ def check_batch_completion(batch_folder, output_base_dir):
     if not output_folder.exists():
         return False, 0, 0
     
-    sdf_files = list(batch_folder.glob("*.sdf"))
-    pdbqt_files = list(output_folder.glob("*.pdbqt"))
-    
-    total_sdf = len(sdf_files)
-    total_pdbqt = len(pdbqt_files)
+    # One directory-block read per folder instead of two globs that build a
+    # Path object per entry just to count them.
+    with os.scandir(batch_folder) as it:
+        total_sdf = sum(1 for entry in it if entry.name.endswith('.sdf'))
+    # A batch.sqlite is trusted as the output container even when the current
+    # run has ARCHIVE_OUTPUTS = False — it means an earlier archived run
+    # produced this batch. A corrupt or half-written container (interrupted
+    # run, truncated copy) must not crash the resume check, so any sqlite
+    # error falls back to counting loose .pdbqt files.
+    db_path = output_folder / "batch.sqlite"
+    total_pdbqt = None
+    if db_path.exists():
+        try:
+            with sqlite3.connect(db_path) as db:
+                total_pdbqt = db.execute("SELECT COUNT(*) FROM ligands").fetchone()[0]
+        except sqlite3.Error as e:
+            logging.warning(f"Unreadable batch container {db_path}: {e}; counting loose files instead")
+    if total_pdbqt is None:
+        with os.scandir(output_folder) as it:
+            total_pdbqt = sum(1 for entry in it if entry.name.endswith('.pdbqt'))
     
     # Consider batch completed if 95% or more files are converted
     completion_rate = total_pdbqt / total_sdf if total_sdf > 0 else 0
@@ -161,20 +270,125 @@ def check_batch_completion(batch_folder, output_base_dir):
     
     return is_completed, total_sdf, total_pdbqt
 
+def _has_3d(input_file):
+    """
+    True if the SDF head already carries non-zero Z coordinates.
+
+    Checks the Z column (chars 20-30) of the V2000 atom block in the first
+    4 KiB; 2D inputs write 0.0000 there. Such files only need minimization
+    and export, so the expensive 3D-generation step can be skipped.
+    """
+    try:
+        with open(input_file, 'rb') as f:
+            lines = f.read(4096).splitlines()
+        if len(lines) < 5:
+            return False
+        num_atoms = int(lines[3][0:3])
+        for line in lines[4:4 + num_atoms]:
+            if abs(float(line[20:30])) > 1e-3:
+                return True
+        return False
+    except (OSError, ValueError, IndexError):
+        return False
+
+# (steepest-descent steps, conjugate-gradient steps) per strategy; mirrors
+# the obminimize invocations of the subprocess path.
+MINIMIZATION_STEPS = {
+    "fast": (0, 500),
+    "balanced": (500, 1000),
+    "thorough": (1000, 2000),
+}
+
+class _WatchdogTimeout(Exception):
+    """Raised by the SIGALRM watchdog when the in-process budget runs out"""
+
+def _watchdog_alarm(signum, frame):
+    raise _WatchdogTimeout
+
+def _convert_in_process(input_file, output_file, strategy, return_bytes=False):
+    """
+    In-process conversion pipeline using the OpenBabel Python bindings.
+
+    Runs the same three stages as the subprocess chain (3D generation,
+    staged MMFF94s minimization, Gasteiger charges + PDBQT export) on one
+    OBMol, so the force field is set up once per molecule and no
+    intermediate SDF touches the disk. With return_bytes=True the PDBQT is
+    returned in memory instead of written to output_file, for the
+    coalesced-container mode.
+
+    Returns: tuple (success, error_message, pdbqt_bytes_or_None)
+    """
+    mol = next(pybel.readfile('sdf', str(input_file)), None)
+    if mol is None:
+        return False, "Step 1 (read): could not read molecule from SDF", None
+
+    # Step 1: 3D coordinates (make3D embeds and does a short cleanup run);
+    # inputs that are already 3D go straight to minimization
+    mol.addh()
+    if not _has_3d(input_file):
+        mol.make3D(forcefield='mmff94s', steps=50)
+
+    # Step 2: Energy minimization based on strategy
+    ff = ob.OBForceField.FindForceField('MMFF94s')
+    if ff is None or not ff.Setup(mol.OBMol):
+        return False, "Step 2 (min): MMFF94s setup failed", None
+    sd_steps, cg_steps = MINIMIZATION_STEPS.get(strategy, MINIMIZATION_STEPS["balanced"])
+    if sd_steps:
+        ff.SteepestDescent(sd_steps)
+    ff.ConjugateGradients(cg_steps)
+    ff.GetCoordinates(mol.OBMol)
+
+    # Step 3: Partial charges and PDBQT export
+    mol.calccharges('gasteiger')
+    if return_bytes:
+        pdbqt = mol.write('pdbqt')
+        if not pdbqt.strip():
+            return False, "Step 3 (PDBQT): conversion produced no output", None
+        return True, None, pdbqt.encode()
+
+    mol.write('pdbqt', str(output_file), overwrite=True)
+    if output_file.exists() and output_file.stat().st_size > 0:
+        return True, None, None
+    return False, "Step 3 (PDBQT): output file not created or is empty", None
+
 def convert_single_file(args):
     """
     Convert a single SDF file to PDBQT format with balanced 2-stage minimization
     Args: tuple (input_file_path, output_file_path, strategy, process_id)
-    Returns: tuple (success, input_file, error_message, processing_time, process_id)
+    Returns: tuple (success, input_file, error_message, processing_time, process_id, pdbqt_bytes)
+            pdbqt_bytes is None unless ARCHIVE_OUTPUTS collects results in memory
     """
     input_file, output_file, strategy, process_id = args
     start_time = time.time()
-    
-    # Skip if file already exists and not overwriting
-    if not OVERWRITE_EXISTING and output_file.exists() and output_file.stat().st_size > 0:
-        processing_time = time.time() - start_time
-        return True, input_file.name, "Already exists (skipped)", processing_time, process_id
-    
+
+    # Already-converted files are filtered out by the parent's single scandir
+    # pass before tasks are built, so no per-file stat happens here.
+
+    if HAS_OPENBABEL_BINDINGS:
+        # The in-process pipeline has no subprocess timeouts to lean on, so a
+        # SIGALRM watchdog bounds it instead. Signals can only be installed in
+        # a main thread; each pool worker runs in its own, so this covers both
+        # the serial and the pool path.
+        try:
+            old_handler = signal.signal(signal.SIGALRM, _watchdog_alarm)
+            signal.setitimer(signal.ITIMER_REAL, IN_PROCESS_TIMEOUT_SECONDS)
+        except ValueError:
+            old_handler = None
+        try:
+            success, error, payload = _convert_in_process(
+                input_file, output_file, strategy, return_bytes=ARCHIVE_OUTPUTS)
+            if success:
+                return True, input_file.name, None, time.time() - start_time, process_id, payload
+            return False, input_file.name, error, 0, process_id, None
+        except _WatchdogTimeout:
+            return False, input_file.name, f"Timeout: exceeded {IN_PROCESS_TIMEOUT_SECONDS}s in-process budget", 0, process_id, None
+        except Exception as e:
+            return False, input_file.name, f"Unexpected error: {str(e)}", 0, process_id, None
+        finally:
+            if old_handler is not None:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                signal.signal(signal.SIGALRM, old_handler)
+
     try:
         # Create temporary intermediate file for 3D generation
         temp_3d_file = output_file.with_suffix(f'.temp_3d_p{process_id}.sdf')
@@ -183,148 +397,240 @@ def convert_single_file(args):
         gen3d_success = False
         error_msg_step1 = ""
 
-        # METHOD 1: --gen3D (Fast and standard)
-        step1a_cmd = [
-            'obabel', str(input_file), '-O', str(temp_3d_file),
-            '--gen3D',
-            '-h',
-            '--ff', 'MMFF94s'
-        ]
-        result1a = subprocess.run(step1a_cmd, capture_output=True, text=True, timeout=180)
-        
-        if result1a.returncode == 0 and temp_3d_file.exists() and temp_3d_file.stat().st_size > 0:
+        # Step 1 runs obabel with -h, so molecules that pass through it reach
+        # step 3 already protonated; re-adding hydrogens there would redo a
+        # full protonation + Gasteiger pass per ligand for nothing.
+        hydrogens_added = False
+
+        if _has_3d(input_file):
+            # Input already carries 3D coordinates: minimize and export it
+            # in place, skipping generation entirely.
+            temp_3d_file = input_file
             gen3d_success = True
         else:
-            error_msg_step1 += f"gen3D failed: {result1a.stderr.strip() if result1a.stderr else 'Error'}. "
-            
-            # METHOD 2: --build (Slower but more systematic fallback)
-            step1b_cmd = [
-                'obabel', str(input_file), '-O', str(temp_3d_file),
-                '--build',
-                '-h',
-                '--ff', 'MMFF94s'
-            ]
-            result1b = subprocess.run(step1b_cmd, capture_output=True, text=True, timeout=300)
-            if result1b.returncode == 0 and temp_3d_file.exists() and temp_3d_file.stat().st_size > 0:
+            # 3D generation streams through stdin/stdout pipes; the result is
+            # staged to disk exactly once, only because obminimize and
+            # prepare_ligand4.py below need a real path.
+            sdf_bytes = input_file.read_bytes()
+
+            # METHOD 1: --gen3D (Fast and standard)
+            step1a_cmd = ['obabel', '-isdf', '-osdf', '--gen3D', '-h', '--ff', 'MMFF94s']
+            result1a = subprocess.run(step1a_cmd, input=sdf_bytes, capture_output=True, timeout=180)
+
+            if result1a.returncode == 0 and result1a.stdout.strip():
+                temp_3d_file.write_bytes(result1a.stdout)
                 gen3d_success = True
+                hydrogens_added = True
             else:
-                error_msg_step1 += f"Build failed: {result1b.stderr.strip() if result1b.stderr else 'Error'}."
+                stderr1a = result1a.stderr.decode(errors='replace').strip()
+                error_msg_step1 += f"gen3D failed: {stderr1a if stderr1a else 'Error'}. "
+
+                # METHOD 2: --build (Slower but more systematic fallback)
+                step1b_cmd = ['obabel', '-isdf', '-osdf', '--build', '-h', '--ff', 'MMFF94s']
+                result1b = subprocess.run(step1b_cmd, input=sdf_bytes, capture_output=True, timeout=300)
+                if result1b.returncode == 0 and result1b.stdout.strip():
+                    temp_3d_file.write_bytes(result1b.stdout)
+                    gen3d_success = True
+                    hydrogens_added = True
+                else:
+                    stderr1b = result1b.stderr.decode(errors='replace').strip()
+                    error_msg_step1 += f"Build failed: {stderr1b if stderr1b else 'Error'}."
 
         if not gen3d_success:
-            return False, input_file.name, f"Step 1 (3D gen): {error_msg_step1}", 0, process_id
+            return False, input_file.name, f"Step 1 (3D gen): {error_msg_step1}", 0, process_id, None
         
         # Step 2: Energy minimization based on strategy
         if strategy == "fast":
             step2_cmd = ['obminimize', '-ff', 'MMFF94s', '-cg', '-n', '500', str(temp_3d_file)]
             result2 = subprocess.run(step2_cmd, capture_output=True, text=True, timeout=180)
             if result2.returncode != 0:
-                return False, input_file.name, f"Step 2 (fast min): {result2.stderr.strip()}", 0, process_id
+                return False, input_file.name, f"Step 2 (fast min): {result2.stderr.strip()}", 0, process_id, None
         
         elif strategy == "balanced":
             step2a_cmd = ['obminimize', '-ff', 'MMFF94s', '-sd', '-n', '500', str(temp_3d_file)]
             result2a = subprocess.run(step2a_cmd, capture_output=True, text=True, timeout=180)
             if result2a.returncode != 0:
-                return False, input_file.name, f"Step 2a (SD): {result2a.stderr.strip()}", 0, process_id
+                return False, input_file.name, f"Step 2a (SD): {result2a.stderr.strip()}", 0, process_id, None
             
             step2b_cmd = ['obminimize', '-ff', 'MMFF94s', '-cg', '-n', '1000', str(temp_3d_file)]
             result2b = subprocess.run(step2b_cmd, capture_output=True, text=True, timeout=300)
             if result2b.returncode != 0:
-                return False, input_file.name, f"Step 2b (CG): {result2b.stderr.strip()}", 0, process_id
+                return False, input_file.name, f"Step 2b (CG): {result2b.stderr.strip()}", 0, process_id, None
         
         elif strategy == "thorough":
             step2a_cmd = ['obminimize', '-ff', 'MMFF94s', '-sd', '-n', '1000', str(temp_3d_file)]
             result2a = subprocess.run(step2a_cmd, capture_output=True, text=True, timeout=300)
             if result2a.returncode != 0:
-                return False, input_file.name, f"Step 2a (SD): {result2a.stderr.strip()}", 0, process_id
+                return False, input_file.name, f"Step 2a (SD): {result2a.stderr.strip()}", 0, process_id, None
             
             step2b_cmd = ['obminimize', '-ff', 'MMFF94s', '-cg', '-n', '2000', str(temp_3d_file)]
             result2b = subprocess.run(step2b_cmd, capture_output=True, text=True, timeout=300)
             if result2b.returncode != 0:
-                return False, input_file.name, f"Step 2b (CG): {result2b.stderr.strip()}", 0, process_id
+                return False, input_file.name, f"Step 2b (CG): {result2b.stderr.strip()}", 0, process_id, None
         
         # Step 3: Convert minimized SDF to PDBQT format
         python2_success = False
-        try:
-            # First try with prepare_ligand4.py
-            step3_cmd = ['python2', 'prepare_ligand4.py', '-l', str(temp_3d_file), '-o', str(output_file), '-A', 'hydrogens', '-U', 'nphs_lps', '-v']
-            result3 = subprocess.run(step3_cmd, capture_output=True, text=True, timeout=120)
-            if result3.returncode == 0 and output_file.exists() and output_file.stat().st_size > 0:
-                python2_success = True
-        except (subprocess.TimeoutExpired, FileNotFoundError):
-            pass # Fallback to obabel
+
+        if HAS_MEEKO:
+            # In-process conversion: no interpreter startup per ligand.
+            try:
+                mol = _rdchem.MolFromMolFile(str(temp_3d_file), removeHs=False)
+                if mol is not None:
+                    setups = MoleculePreparation().prepare(mol)
+                    pdbqt_string, ok, _ = PDBQTWriterLegacy.write_string(setups[0])
+                    if ok and pdbqt_string:
+                        output_file.write_text(pdbqt_string)
+                        python2_success = True
+            except Exception:
+                pass  # Meeko rejected the ligand; fall back to subprocess converters
+
+        if not python2_success:
+            try:
+                # Then try with prepare_ligand4.py; only ask it to repair
+                # hydrogens when step 1 did not already add them.
+                step3_cmd = ['python2', 'prepare_ligand4.py', '-l', str(temp_3d_file), '-o', str(output_file), '-U', 'nphs_lps', '-v']
+                if not hydrogens_added:
+                    step3_cmd += ['-A', 'hydrogens']
+                result3 = subprocess.run(step3_cmd, capture_output=True, text=True, timeout=120)
+                if result3.returncode == 0 and output_file.exists() and output_file.stat().st_size > 0:
+                    python2_success = True
+            except (subprocess.TimeoutExpired, FileNotFoundError):
+                pass # Fallback to obabel
         
         if not python2_success:
-            # Fallback to Open Babel PDBQT conversion
-            step3_cmd = ['obabel', str(temp_3d_file), '-O', str(output_file), '-p', '7.4', '--partialcharge', 'gasteiger', '-h']
+            # Fallback to Open Babel PDBQT conversion; -h only when the
+            # molecule skipped step 1 and may still be missing hydrogens.
+            step3_cmd = ['obabel', str(temp_3d_file), '-O', str(output_file), '-p', '7.4', '--partialcharge', 'gasteiger']
+            if not hydrogens_added:
+                step3_cmd.append('-h')
             result3 = subprocess.run(step3_cmd, capture_output=True, text=True, timeout=120)
             if result3.returncode != 0:
-                return False, input_file.name, f"Step 3 (PDBQT Fallback): {result3.stderr.strip()}", 0, process_id
+                return False, input_file.name, f"Step 3 (PDBQT Fallback): {result3.stderr.strip()}", 0, process_id, None
         
-        try:
-            temp_3d_file.unlink() # Clean up temporary file
-        except FileNotFoundError:
-            pass
+        if temp_3d_file != input_file:
+            try:
+                temp_3d_file.unlink() # Clean up temporary file
+            except FileNotFoundError:
+                pass
         
         # Step 4: Assume success if PDBQT file was created and is not empty.
         if output_file.exists() and output_file.stat().st_size > 0:
             processing_time = time.time() - start_time
-            return True, input_file.name, None, processing_time, process_id
+            payload = None
+            if ARCHIVE_OUTPUTS:
+                # Container mode: hand the bytes to the parent and drop the
+                # loose file so only batch.sqlite remains on disk.
+                payload = output_file.read_bytes()
+                output_file.unlink()
+            return True, input_file.name, None, processing_time, process_id, payload
         else:
-            return False, input_file.name, "Final PDBQT file not created or is empty.", 0, process_id            
+            return False, input_file.name, "Final PDBQT file not created or is empty.", 0, process_id, None
     except subprocess.TimeoutExpired:
-        return False, input_file.name, "Processing timeout", 0, process_id
+        return False, input_file.name, "Processing timeout", 0, process_id, None
     except Exception as e:
-        return False, input_file.name, f"Unexpected error: {str(e)}", 0, process_id
+        return False, input_file.name, f"Unexpected error: {str(e)}", 0, process_id, None
+
+def _init_worker(worker_slot=None):
+    """
+    Pool initializer: pins the worker to a core and warms OpenBabel state.
 
-def progress_monitor(total_files, result_queue, logger, batch_name):
+    Each worker claims the next slot from a shared counter and binds itself
+    to that core, so the scheduler stops migrating the worker (and the
+    obabel subprocesses it forks, which inherit the affinity) and the MMFF
+    parameter data stays hot in one core's caches. os.nice(5) keeps
+    interactive shells responsive on shared nodes. FindForceField then
+    loads the MMFF94s parameter tables (~2 MB of text) and triggers plugin
+    discovery so even the first real task hits warm tables. Pinning is
+    skipped quietly where unsupported.
     """
-    Monitor and report progress in real-time
+    if worker_slot is not None:
+        with worker_slot.get_lock():
+            worker_idx = worker_slot.value
+            worker_slot.value += 1
+        try:
+            os.sched_setaffinity(0, {worker_idx % os.cpu_count()})
+            os.nice(5)
+        except (AttributeError, OSError):
+            pass
+    if HAS_OPENBABEL_BINDINGS:
+        ob.OBForceField.FindForceField('MMFF94s')
+
+def progress_monitor(total_files, results, logger, batch_name, payload_sink=None,
+                     initial_skipped=0):
     """
-    completed = 0
+    Consume conversion results and report progress in real-time
+
+    Hot-path logging uses lazy %-formatting (skipped entirely if the level
+    is filtered) and failures are coalesced into one log call per report
+    interval instead of one LogRecord per failed file. payload_sink, when
+    given, receives (filename, pdbqt_bytes) for results that carry their
+    output in memory (ARCHIVE_OUTPUTS mode). Files the parent filtered out
+    before enqueuing enter the counters via initial_skipped, so resumed
+    batches report [done/total] against the full batch size.
+    """
+    completed = initial_skipped
     successful = 0
     failed = 0
-    skipped = 0
+    skipped = initial_skipped
     total_time = 0
     start_time = time.time()
-    
-    logger.info(f"Processing {total_files} files in {batch_name}...")
-    
-    while completed < total_files:
+
+    log_info = logger.info
+    log_error = logger.error
+    failure_buf = []
+
+    log_info("Processing %d files in %s (%d already done)...",
+             total_files, batch_name, initial_skipped)
+
+    results = iter(results)
+    while True:
         try:
-            success, filename, error, proc_time, process_id = result_queue.get(timeout=30)
-            completed += 1
-            total_time += proc_time
-            
-            if success:
-                if error and "Already exists" in error:
-                    skipped += 1
-                else:
-                    successful += 1
+            success, filename, error, proc_time, process_id, payload = next(results)
+        except StopIteration:
+            break
+        except BrokenProcessPool:
+            # A worker died mid-task (typically a native crash in OpenBabel
+            # on a garbage ligand). The executor cannot deliver the rest of
+            # this batch's results, so count them as failed and let the run
+            # carry on with the next batch instead of aborting.
+            lost = total_files - completed
+            failed += lost
+            completed = total_files
+            log_error("Worker process died in %s; counting %d undelivered tasks as failed.",
+                      batch_name, lost)
+            break
+        completed += 1
+        total_time += proc_time
+
+        if success:
+            if error and "Already exists" in error:
+                skipped += 1
             else:
-                failed += 1
-                logger.error(f"Process {process_id}: Failed to convert {filename}: {error}")
-            
-            # Report progress
-            if completed % PROGRESS_REPORT_FREQUENCY == 0 or completed in [1, 10, 50] or completed == total_files:
-                elapsed_time = time.time() - start_time
-                rate = completed / elapsed_time if elapsed_time > 0 else 0
-                eta = (total_files - completed) / rate if rate > 0 else 0
-                avg_time = total_time / completed if completed > 0 else 0
-                
-                progress_message = (
-                    f"PROGRESS [{batch_name}]: [{completed}/{total_files}] | "
-                    f"Success: {successful}, Failed: {failed}, Skipped: {skipped} | "
-                    f"Rate: {rate:.1f} f/s | Avg: {avg_time:.2f} s/f | ETA: {eta/60:.1f} min"
-                )
-                logger.info(progress_message)
-        
-        except queue.Empty:
-            if not any(p.is_alive() for p in mp.active_children()):
-                if completed < total_files:
-                    logger.warning(f"All worker processes terminated for {batch_name}, but not all tasks are complete.")
-                break
-            continue
-    
+                successful += 1
+                if payload_sink is not None and payload is not None:
+                    payload_sink(filename, payload)
+        else:
+            failed += 1
+            failure_buf.append(f"Process {process_id}: Failed to convert {filename}: {error}")
+            if len(failure_buf) >= PROGRESS_REPORT_FREQUENCY:
+                log_error("\n".join(failure_buf))
+                failure_buf.clear()
+
+        # Report progress
+        if completed % PROGRESS_REPORT_FREQUENCY == 0 or completed in [1, 10, 50] or completed == total_files:
+            elapsed_time = time.time() - start_time
+            rate = completed / elapsed_time if elapsed_time > 0 else 0
+            eta = (total_files - completed) / rate if rate > 0 else 0
+            avg_time = total_time / completed if completed > 0 else 0
+
+            log_info("PROGRESS [%s]: [%d/%d] | Success: %d, Failed: %d, Skipped: %d | "
+                     "Rate: %.1f f/s | Avg: %.2f s/f | ETA: %.1f min",
+                     batch_name, completed, total_files, successful, failed, skipped,
+                     rate, avg_time, eta / 60)
+
+    if failure_buf:
+        log_error("\n".join(failure_buf))
+
     total_elapsed = time.time() - start_time
     
     logger.info("="*50 + f" {batch_name} SUMMARY " + "="*50)
@@ -340,22 +646,6 @@ def progress_monitor(total_files, result_queue, logger, batch_name):
     
     return successful, failed, skipped, total_elapsed
 
-def worker_process(task_queue, result_queue):
-    """
-    Worker process for parallel processing
-    """
-    while True:
-        try:
-            args = task_queue.get(timeout=10)
-            if args is None:  # Poison pill to stop
-                break
-            result = convert_single_file(args)
-            result_queue.put(result)
-        except queue.Empty:
-            break
-        except Exception as e:
-            break
-
 def process_batch_folder_parallel(batch_folder, output_base_dir, num_processes, logger, file_limit=None):
     """
     Process all SDF files in a batch folder using maximum parallelization
@@ -363,42 +653,100 @@ def process_batch_folder_parallel(batch_folder, output_base_dir, num_processes,
     output_folder = output_base_dir / batch_folder.name
     output_folder.mkdir(exist_ok=True)
     
-    sdf_files = sorted(list(batch_folder.glob("*.sdf")))
-    
+    # Plain name strings from scandir; Path objects are only built for the
+    # files that actually get enqueued, after filtering.
+    with os.scandir(batch_folder) as it:
+        sdf_names = sorted(entry.name for entry in it if entry.name.endswith('.sdf'))
+
     if file_limit:
-        sdf_files = sdf_files[:file_limit]
-    
-    if not sdf_files:
+        sdf_names = sdf_names[:file_limit]
+
+    if not sdf_names:
         logger.warning(f"No SDF files found in {batch_folder}")
         return 0, 0, 0, 0
-    
-    total_files = len(sdf_files)
-    
-    logger.info(f"Found {total_files} SDF files in {batch_folder.name}")
+
+    logger.info(f"Found {len(sdf_names)} SDF files in {batch_folder.name}")
     if file_limit:
-        logger.info(f"Processing a limited subset of {len(sdf_files)} files for this run.")
-    
-    manager = mp.Manager()
-    task_queue = manager.Queue()
-    result_queue = manager.Queue()
-    
-    for i, sdf_file in enumerate(sdf_files):
-        output_file = output_folder / f"{sdf_file.stem}.pdbqt"
-        task_queue.put((sdf_file, output_file, MINIMIZATION_STRATEGY, i % num_processes))
-    
-    workers = []
-    for i in range(num_processes):
-        worker = mp.Process(target=worker_process, args=(task_queue, result_queue))
-        worker.daemon = True
-        worker.start()
-        workers.append(worker)
-    
-    successful, failed, skipped, total_time = progress_monitor(total_files, result_queue, logger, batch_folder.name)
-    
-    for worker in workers:
-        worker.join(timeout=10)
-    
-    return successful, failed, skipped, total_time
+        logger.info(f"Processing a limited subset of {len(sdf_names)} files for this run.")
+
+    # One scandir pass over the output folder replaces two stat() calls per
+    # file; already-converted inputs never reach a worker at all.
+    db_path = output_folder / "batch.sqlite"
+    skipped_existing = 0
+    if not OVERWRITE_EXISTING:
+        if ARCHIVE_OUTPUTS and db_path.exists():
+            with sqlite3.connect(db_path) as db:
+                existing = {f"{name}.pdbqt" for (name,) in db.execute("SELECT name FROM ligands")}
+        else:
+            with os.scandir(output_folder) as it:
+                existing = {entry.name for entry in it
+                            if entry.is_file(follow_symlinks=False) and entry.stat().st_size > 0}
+        if existing:
+            before = len(sdf_names)
+            sdf_names = [name for name in sdf_names if f"{name[:-4]}.pdbqt" not in existing]
+            skipped_existing = before - len(sdf_names)
+            if skipped_existing:
+                logger.info(f"Skipping {skipped_existing} already-converted files.")
+
+    if not sdf_names:
+        logger.info(f"All files in {batch_folder.name} already converted.")
+        return 0, 0, skipped_existing, 0
+
+    total_files = len(sdf_names)
+
+    # Scale the pool to the work actually left; tail batches and resumed
+    # runs with a few stragglers should not pay for a full 55-worker spawn.
+    num_processes = min(num_processes, max(1, total_files // MIN_TASKS_PER_WORKER))
+
+    tasks = [(batch_folder / name, output_folder / f"{name[:-4]}.pdbqt", MINIMIZATION_STRATEGY, i % num_processes)
+             for i, name in enumerate(sdf_names)]
+
+    # Container mode: the parent owns one sqlite connection and batches the
+    # workers' in-memory PDBQT blobs into executemany inserts, so a batch
+    # costs a handful of sequential writes instead of one file per ligand.
+    db = None
+    payload_sink = None
+    if ARCHIVE_OUTPUTS:
+        db = sqlite3.connect(db_path)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("CREATE TABLE IF NOT EXISTS ligands(name TEXT PRIMARY KEY, pdbqt BLOB)")
+        pending = []
+
+        def payload_sink(filename, payload):
+            pending.append((filename[:-4], payload))
+            if len(pending) >= ARCHIVE_INSERT_BATCH:
+                db.executemany("INSERT OR REPLACE INTO ligands(name, pdbqt) VALUES (?, ?)", pending)
+                db.commit()
+                pending.clear()
+
+    try:
+        if num_processes <= 1 or total_files < MIN_FILES_FOR_POOL:
+            # Not enough work to pay for a pool; run inline.
+            logger.info(f"Running {total_files} files serially (below pool threshold).")
+            results = map(convert_single_file, tasks)
+            return progress_monitor(total_files + skipped_existing, results, logger,
+                                    batch_folder.name, payload_sink, skipped_existing)
+
+        # A persistent forked pool with chunked map replaces the old
+        # Manager().Queue setup: no broker process, and tasks/results are
+        # pickled once per chunk instead of one proxied round-trip per file.
+        ctx = mp.get_context('fork')
+        chunksize = max(1, total_files // (num_processes * 8))
+        worker_slot = ctx.Value('i', 0)
+        logger.info(f"Running {total_files} files on {num_processes} workers (chunksize {chunksize}).")
+        with ProcessPoolExecutor(max_workers=num_processes, mp_context=ctx,
+                                 initializer=_init_worker,
+                                 initargs=(worker_slot,)) as executor:
+            results = executor.map(convert_single_file, tasks, chunksize=chunksize)
+            return progress_monitor(total_files + skipped_existing, results, logger,
+                                    batch_folder.name, payload_sink, skipped_existing)
+    finally:
+        if db is not None:
+            if pending:
+                db.executemany("INSERT OR REPLACE INTO ligands(name, pdbqt) VALUES (?, ?)", pending)
+            db.commit()
+            db.close()
 
 def main():
     """
@@ -407,8 +755,17 @@ def main():
     # Setup main logging
     output_base_dir = Path(OUTPUT_BASE_DIR)
     output_base_dir.mkdir(exist_ok=True)
-    logger = setup_logging(output_base_dir)
-    
+    logger, log_listener = setup_logging(output_base_dir)
+    try:
+        _run_conversion(logger, output_base_dir)
+    finally:
+        # Drain any queued records before the process exits
+        log_listener.stop()
+
+def _run_conversion(logger, output_base_dir):
+    """
+    Body of main(): batch discovery, selection and the conversion loop
+    """
     # Display configuration
     logger.info("="*70)
     logger.info("SDF to PDBQT Multi-Batch Converter")
@@ -428,7 +785,7 @@ def main():
     logger.info("="*70)
     
     # Check OpenBabel
-    if not check_openbabel():
+    if not check_openbabel(cache_dir=output_base_dir):
         logger.error("OpenBabel check failed. Exiting.")
         return
     
@@ -526,6 +883,25 @@ def main():
         logger.info(f"Overall throughput: {(total_successful+total_failed+total_skipped)/total_elapsed:.2f} files/second")
     logger.info("="*80)
 
+def dump_sqlite_to_files(sqlite_path, dest_dir):
+    """
+    Extract every ligand from a batch.sqlite container as a loose .pdbqt file
+
+    Compatibility escape hatch for downstream tools that cannot read the
+    container produced with ARCHIVE_OUTPUTS.
+    """
+    dest = Path(dest_dir)
+    dest.mkdir(parents=True, exist_ok=True)
+    count = 0
+    with sqlite3.connect(sqlite_path) as db:
+        for name, pdbqt in db.execute("SELECT name, pdbqt FROM ligands"):
+            (dest / f"{name}.pdbqt").write_bytes(pdbqt)
+            count += 1
+    print(f"Extracted {count} PDBQT files to {dest}")
+
 if __name__ == "__main__":
     mp.freeze_support()
-    main()
\ No newline at end of file
+    if len(sys.argv) >= 3 and sys.argv[1] == "dump-sqlite-to-files":
+        dump_sqlite_to_files(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else ".")
+    else:
+        main()
\ No newline at end of file
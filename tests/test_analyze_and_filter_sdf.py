@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import pytest
+from rdkit import Chem
+from rdkit.Chem import rdMolDescriptors
+from analyze_and_filter_sdf import _cheap_rotbond_upper_bound, _find_bridges
+
+def _estimate_and_truth(smiles, explicit_h=False):
+    """SMILES'ten V2000 bloğu üretir; (tahmin, RDKit gerçek sayısı) döndürür"""
+    mol = Chem.MolFromSmiles(smiles)
+    if explicit_h:
+        mol = Chem.AddHs(mol)
+    sdf_bytes = Chem.MolToMolBlock(mol).encode()
+    return _cheap_rotbond_upper_bound(sdf_bytes), rdMolDescriptors.CalcNumRotatableBonds(mol)
+
+class TestCheapRotbondUpperBound:
+    """Bayt düzeyi döndürülebilir bağ tahmincisi test sınıfı"""
+
+    def test_linear_chain_matches_rdkit(self):
+        """Düz zincirde tahminin RDKit ile birebir eşleştiğini test eder"""
+        estimate, truth = _estimate_and_truth("CCCCCC")  # n-hekzan
+        assert estimate == truth == 3
+
+    def test_ring_bonds_excluded(self):
+        """Halka bağlarının köprü aramasıyla dışlandığını test eder"""
+        estimate, truth = _estimate_and_truth("C1CCCCC1")  # siklohekzan
+        assert estimate == truth == 0
+
+        estimate, truth = _estimate_and_truth("CCc1ccccc1")  # etilbenzen
+        assert estimate == truth == 1
+
+    def test_terminal_heavy_atoms_not_counted(self):
+        """Uç ağır atomlara giden bağların sayılmadığını test eder"""
+        estimate, truth = _estimate_and_truth("CC(C)(C)C")  # neopentan
+        assert estimate == truth == 0
+
+    def test_explicit_hydrogens_do_not_inflate_estimate(self):
+        """Açık hidrojenli kayıtlarda tahminin şişmediğini test eder"""
+        for smiles in ("CCCCCC", "CCc1ccccc1", "CC(C)(C)C"):
+            implicit, truth = _estimate_and_truth(smiles)
+            explicit, _ = _estimate_and_truth(smiles, explicit_h=True)
+            assert implicit == explicit == truth
+
+    def test_amide_bonds_overcounted_but_upper_bound(self):
+        """Amit bağlarının üst sınırı aştığını ama tahminin hâlâ üst sınır
+        olduğunu test eder (bilinen yanlış-red sınıfı)"""
+        # N-metilasetamit: RDKit amit bağını dışlar, bağlantı tablosu göremez
+        estimate, truth = _estimate_and_truth("CC(=O)NC")
+        assert truth == 0
+        assert estimate > truth
+
+        # Peptit benzeri omurga: her amit bir kez fazla sayılır; tahmin asla
+        # gerçeğin altına düşmemelidir (üst sınır özelliği)
+        estimate, truth = _estimate_and_truth("CC(N)C(=O)NC(C)C(=O)NC(C)C(=O)O")
+        assert estimate >= truth
+
+    def test_unparseable_block_returns_none(self):
+        """Çözümlenemeyen blok için None döndüğünü test eder"""
+        assert _cheap_rotbond_upper_bound(b"not an sdf block") is None
+        assert _cheap_rotbond_upper_bound(b"a\nb\nc\n  x  y\n") is None
+
+class TestFindBridges:
+    """Köprü bağ araması test sınıfı"""
+
+    def _adjacency(self, num_atoms, bonds):
+        """(atom1, atom2) listesinden 1 tabanlı komşuluk listesi kurar"""
+        adjacency = [[] for _ in range(num_atoms + 1)]
+        for i, (a1, a2) in enumerate(bonds):
+            adjacency[a1].append((a2, i))
+            adjacency[a2].append((a1, i))
+        return adjacency
+
+    def test_chain_all_bridges(self):
+        """Düz zincirde her bağın köprü olduğunu test eder"""
+        bonds = [(1, 2), (2, 3), (3, 4)]
+        is_bridge = _find_bridges(4, self._adjacency(4, bonds))
+        assert is_bridge == [True, True, True]
+
+    def test_ring_no_bridges(self):
+        """Halkada hiçbir bağın köprü olmadığını test eder"""
+        bonds = [(1, 2), (2, 3), (3, 1)]
+        is_bridge = _find_bridges(3, self._adjacency(3, bonds))
+        assert is_bridge == [False, False, False]
+
+    def test_ring_with_tail(self):
+        """Halkaya bağlı kuyrukta yalnız kuyruk bağının köprü olduğunu test eder"""
+        bonds = [(1, 2), (2, 3), (3, 1), (3, 4)]
+        is_bridge = _find_bridges(4, self._adjacency(4, bonds))
+        assert is_bridge == [False, False, False, True]
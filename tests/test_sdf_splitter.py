@@ -2,10 +2,64 @@
 # -*- coding: utf-8 -*-
 
 import pytest
+import tarfile
 import tempfile
 import shutil
 from pathlib import Path
-from sdf_splitter import split_sdf_file, extract_database_id
+from sdf_splitter import split_sdf_file, split_and_filter, extract_database_id
+
+# Örnek SDF içeriği bir kez, import sırasında bytes olarak hazırlanır
+_SAMPLE_SDF = b"".join([
+    b"Molecule1\n",
+    b"  RDKit          2D\n",
+    b"\n",
+    b"  3  2  0  0  0  0  0  0  0  0999 V2000\n",
+    b"    0.0000    0.0000    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0\n",
+    b"    1.0000    0.0000    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0\n",
+    b"    2.0000    0.0000    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0\n",
+    b"  1  2  1  0  0  0  0\n",
+    b"  2  3  1  0  0  0  0\n",
+    b"M  END\n",
+    b"> <DATABASE_ID>\n",
+    b"Molecule1\n",
+    b"$$$$\n",
+    b"\n",
+    b"Molecule2\n",
+    b"  RDKit          2D\n",
+    b"\n",
+    b"  2  1  0  0  0  0  0  0  0  0999 V2000\n",
+    b"    0.0000    0.0000    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0\n",
+    b"    1.0000    0.0000    0.0000 O   0  0  0  0  0  0  0  0  0  0  0  0\n",
+    b"  1  2  1  0  0  0  0\n",
+    b"M  END\n",
+    b"> <DATABASE_ID>\n",
+    b"Molecule2\n",
+    b"$$$$",
+])
+
+# Esnek bir zincir (n-hekzan, 3 döndürülebilir bağ): split_and_filter'ın
+# eşik üstü molekülleri gerçekten elediğini doğrulamak için kullanılır
+_HEXANE_SDF = b"".join([
+    b"Hexane\n",
+    b"  RDKit          2D\n",
+    b"\n",
+    b"  6  5  0  0  0  0  0  0  0  0999 V2000\n",
+    b"    0.0000    0.0000    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0\n",
+    b"    1.0000    0.0000    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0\n",
+    b"    2.0000    0.0000    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0\n",
+    b"    3.0000    0.0000    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0\n",
+    b"    4.0000    0.0000    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0\n",
+    b"    5.0000    0.0000    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0\n",
+    b"  1  2  1  0  0  0  0\n",
+    b"  2  3  1  0  0  0  0\n",
+    b"  3  4  1  0  0  0  0\n",
+    b"  4  5  1  0  0  0  0\n",
+    b"  5  6  1  0  0  0  0\n",
+    b"M  END\n",
+    b"> <DATABASE_ID>\n",
+    b"Hexane\n",
+    b"$$$$\n",
+])
 
 class TestSDFSplitter:
     """SDF Splitter test sınıfı"""
@@ -17,39 +71,13 @@ class TestSDFSplitter:
         yield Path(temp_dir)
         shutil.rmtree(temp_dir)
     
-    @pytest.fixture
-    def sample_sdf_file(self, temp_dir):
-        """Örnek SDF dosyası oluşturur"""
-        sdf_content = """Molecule1
-  RDKit          2D
-
-  3  2  0  0  0  0  0  0  0  0999 V2000
-    0.0000    0.0000    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0
-    1.0000    0.0000    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0
-    2.0000    0.0000    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0
-  1  2  1  0  0  0  0
-  2  3  1  0  0  0  0
-M  END
-> <DATABASE_ID>
-Molecule1
-$$$$
-
-Molecule2
-  RDKit          2D
-
-  2  1  0  0  0  0  0  0  0  0999 V2000
-    0.0000    0.0000    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0
-    1.0000    0.0000    0.0000 O   0  0  0  0  0  0  0  0  0  0  0  0
-  1  2  1  0  0  0  0
-M  END
-> <DATABASE_ID>
-Molecule2
-$$$$"""
-        
-        sdf_file = temp_dir / "test.sdf"
-        with open(sdf_file, 'w') as f:
-            f.write(sdf_content)
-        return sdf_file
+    @pytest.fixture(scope="module")
+    def sample_sdf_file(self):
+        """Örnek SDF dosyasını modül başına bir kez oluşturur (salt okunur)"""
+        with tempfile.TemporaryDirectory() as sample_dir:
+            sdf_file = Path(sample_dir) / "test.sdf"
+            sdf_file.write_bytes(_SAMPLE_SDF)
+            yield sdf_file
     
     def test_extract_database_id(self):
         """DATABASE_ID çıkarma fonksiyonunu test eder"""
@@ -64,6 +92,19 @@ $$$$"""
         database_id = extract_database_id(compound_lines)
         assert database_id == "Molecule1"
     
+    def test_extract_database_id_bytes(self):
+        """Bytes bloklar için DATABASE_ID çıkarma fonksiyonunu test eder"""
+        compound_block = (
+            b"Molecule1\n"
+            b"  RDKit          2D\n"
+            b"> <DATABASE_ID>\n"
+            b"Molecule1\n"
+            b"$$$$\n"
+        )
+
+        database_id = extract_database_id(compound_block)
+        assert database_id == "Molecule1"
+
     def test_extract_database_id_not_found(self):
         """DATABASE_ID bulunamadığında None döndüğünü test eder"""
         compound_lines = [
@@ -112,6 +153,46 @@ $$$$"""
         sdf_files = list(batch_dirs[0].glob("*.sdf"))
         assert len(sdf_files) == 2
     
+    def test_split_sdf_file_archive_batches(self, temp_dir, sample_sdf_file):
+        """Arşiv modunda tar gidiş-dönüşünün verisiz kayıpsız olduğunu test eder"""
+        output_dir = temp_dir / "output"
+
+        # Arşiv modu ile böl: klasör yerine batch başına bir .tar beklenir
+        split_sdf_file(str(sample_sdf_file), str(output_dir),
+                       compounds_per_folder=1, archive_batches=True)
+
+        tar_paths = sorted(output_dir.glob("batch_*.tar"))
+        assert len(tar_paths) == 2
+        assert not [p for p in output_dir.glob("batch_*") if p.is_dir()]
+
+        # Üyeleri geri oku ve kaynak bloklarla bayt bayt karşılaştır
+        blocks = {}
+        for tar_path in tar_paths:
+            with tarfile.open(tar_path, 'r') as tar:
+                for member in tar.getmembers():
+                    blocks[member.name] = tar.extractfile(member).read()
+
+        assert set(blocks) == {"Molecule1.sdf", "Molecule2.sdf"}
+        for name, block in blocks.items():
+            assert block in _SAMPLE_SDF
+            assert extract_database_id(block) == name[:-len(".sdf")]
+
+    def test_split_and_filter_threshold(self, temp_dir):
+        """Tek geçişli böl+filtrele akışında eşik elemesini test eder"""
+        input_file = temp_dir / "mixed.sdf"
+        # Kayıt aralarındaki boş satırlar kaldırılır: akış okuyucu blokları
+        # $$$$ satırından böler ve RDKit blok başında boş satır kabul etmez
+        input_file.write_bytes(
+            _SAMPLE_SDF.replace(b"$$$$\n\n", b"$$$$\n") + b"\n" + _HEXANE_SDF)
+        output_dir = temp_dir / "filtered"
+
+        # Hekzan 3 döndürülebilir bağ taşır; eşik 2 ile elenmelidir
+        split_and_filter(str(input_file), str(output_dir), threshold=2,
+                         compounds_per_folder=10, num_processes=1)
+
+        written = sorted(f.name for f in output_dir.glob("batch_*/*.sdf"))
+        assert written == ["Molecule1.sdf", "Molecule2.sdf"]
+
     def test_split_sdf_file_nonexistent_input(self, temp_dir):
         """Var olmayan giriş dosyası durumunu test eder"""
         output_dir = temp_dir / "output"
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import pytest
+import tempfile
+import shutil
+from pathlib import Path
+from sdf_to_pdbqt_converter import _has_3d
+
+def _molblock(z_coords):
+    """Verilen Z koordinatlarıyla tek moleküllü bir V2000 bloğu üretir"""
+    atom_lines = "".join(
+        f"    0.0000    0.0000{z:10.4f} C   0  0  0  0  0  0  0  0  0  0  0  0\n"
+        for z in z_coords
+    )
+    return (
+        "Molecule\n"
+        "  RDKit          2D\n"
+        "\n"
+        f"{len(z_coords):3d}  0  0  0  0  0  0  0  0  0999 V2000\n"
+        f"{atom_lines}"
+        "M  END\n"
+        "$$$$\n"
+    )
+
+class TestHas3D:
+    """2D/3D girdi ayrımı test sınıfı"""
+
+    @pytest.fixture
+    def temp_dir(self):
+        """Geçici test dizini oluşturur"""
+        temp_dir = tempfile.mkdtemp()
+        yield Path(temp_dir)
+        shutil.rmtree(temp_dir)
+
+    def test_2d_block_returns_false(self, temp_dir):
+        """Tüm Z koordinatları sıfır olan kaydın 2D sayıldığını test eder"""
+        sdf_file = temp_dir / "flat.sdf"
+        sdf_file.write_text(_molblock([0.0, 0.0, 0.0]))
+        assert _has_3d(sdf_file) is False
+
+    def test_3d_block_returns_true(self, temp_dir):
+        """Sıfırdan farklı bir Z koordinatının 3D sayıldığını test eder"""
+        sdf_file = temp_dir / "embedded.sdf"
+        sdf_file.write_text(_molblock([0.0, 1.5, -0.7]))
+        assert _has_3d(sdf_file) is True
+
+    def test_near_zero_z_is_still_2d(self, temp_dir):
+        """Yuvarlama gürültüsü düzeyindeki Z'nin 3D sayılmadığını test eder"""
+        sdf_file = temp_dir / "noise.sdf"
+        sdf_file.write_text(_molblock([0.0005, -0.0003]))
+        assert _has_3d(sdf_file) is False
+
+    def test_missing_file_returns_false(self, temp_dir):
+        """Var olmayan dosya için False döndüğünü test eder"""
+        assert _has_3d(temp_dir / "nonexistent.sdf") is False
+
+    def test_malformed_header_returns_false(self, temp_dir):
+        """Bozuk başlıklı dosya için False döndüğünü test eder"""
+        sdf_file = temp_dir / "garbage.sdf"
+        sdf_file.write_text("not\nan\nsdf\nfile at all\nxx\n")
+        assert _has_3d(sdf_file) is False
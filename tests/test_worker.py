@@ -6,7 +6,7 @@ import tempfile
 import shutil
 import subprocess
 from pathlib import Path
-from worker import convert_single_file
+from worker import convert_single_file, _quick_validate_sdf, _read_pair_list
 
 class TestWorker:
     """Worker script test sınıfı"""
@@ -175,6 +175,58 @@ $$$$"""
         if not success:
             assert not output_file.exists() or output_file.stat().st_size == 0
     
+    def test_quick_validate_sdf_valid(self, sample_sdf_file):
+        """Geçerli bir V2000 kaydının ön kontrolden geçtiğini test eder"""
+        assert _quick_validate_sdf(str(sample_sdf_file)) is None
+
+    def test_quick_validate_sdf_unknown_element(self, temp_dir):
+        """Bilinmeyen element sembolünün hata mesajıyla reddedildiğini test eder"""
+        sdf_content = """Bad Molecule
+  RDKit          2D
+
+  1  0  0  0  0  0  0  0  0  0999 V2000
+    0.0000    0.0000    0.0000 Xx  0  0  0  0  0  0  0  0  0  0  0  0
+M  END
+$$$$"""
+        sdf_file = temp_dir / "bad.sdf"
+        sdf_file.write_text(sdf_content)
+
+        error = _quick_validate_sdf(str(sdf_file))
+        assert error is not None
+        assert "Xx" in error
+
+    def test_quick_validate_sdf_malformed_header(self, temp_dir):
+        """Bozuk başlıkta kararın dönüştürücüye bırakıldığını test eder"""
+        sdf_file = temp_dir / "garbage.sdf"
+        sdf_file.write_text("not\nan\nsdf\nfile at all\n")
+
+        # Sayım satırı çözümlenemiyorsa ön kontrol reddetmez (None döner)
+        assert _quick_validate_sdf(str(sdf_file)) is None
+
+    def test_read_pair_list(self, temp_dir):
+        """--input-list çift listesinin doğru çözümlendiğini test eder"""
+        list_file = temp_dir / "pairs.list"
+        list_file.write_text(
+            "a.sdf\tout/a.pdbqt\n"
+            "\n"
+            "b.sdf\tout/b.pdbqt\n"
+        )
+
+        pairs = _read_pair_list(str(list_file))
+        assert pairs == [("a.sdf", "out/a.pdbqt"), ("b.sdf", "out/b.pdbqt")]
+
+    def test_read_pair_list_skips_bad_lines(self, temp_dir):
+        """Sekmesiz satırların koşuyu düşürmeden atlandığını test eder"""
+        list_file = temp_dir / "pairs.list"
+        list_file.write_text(
+            "a.sdf\tout/a.pdbqt\n"
+            "line without a tab separator\n"
+            "c.sdf\tout/c.pdbqt\n"
+        )
+
+        pairs = _read_pair_list(str(list_file))
+        assert pairs == [("a.sdf", "out/a.pdbqt"), ("c.sdf", "out/c.pdbqt")]
+
     @pytest.mark.skipif(not shutil.which('obabel'), reason="OpenBabel not installed")
     def test_openbabel_available(self):
         """OpenBabel'in mevcut olduğunu test eder"""
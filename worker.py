@@ -2,97 +2,498 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import os
+import shutil
 import subprocess
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
 from pathlib import Path
+import re
+import signal
 import sys
+import time
 import logging
 
-# Loglamay� basit tutuyoruz, ��nk� her i�lem kendi logunu stderr'e yazabilir
+# OpenBabel'in Python bağları tüm boru hattını (3D üretim, minimizasyon,
+# PDBQT yazımı) tek süreçte çalıştırır: molekül başına fork+exec ve kuvvet
+# alanı parametre yüklemesi yok. Yalnızca komut satırı araçları kurulu ise
+# alttaki subprocess zincirine geri düşülür.
+try:
+    from openbabel import openbabel as ob, pybel
+    HAS_OPENBABEL_BINDINGS = True
+except ImportError:
+    HAS_OPENBABEL_BINDINGS = False
+
+# RDKit'in ETKDGv3 gömücüsü OpenBabel --gen3D'den kat kat hızlı ve takılma
+# vakalarına karşı çok daha dayanıklı; varsa 3D üretim + minimizasyon RDKit'te
+# yapılır, OpenBabel yalnızca Gasteiger yükleri ve PDBQT yazımı için kalır.
+try:
+    from rdkit import Chem
+    from rdkit.Chem import AllChem
+    HAS_RDKIT = True
+except ImportError:
+    HAS_RDKIT = False
+
+# Loglamayı basit tutuyoruz, çünkü her işlem kendi logunu stderr'e yazabilir
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s', stream=sys.stderr)
 
-def convert_single_file(input_sdf, output_pdbqt, strategy, overwrite):
+# MMFF94s parametre tabloları ve Gasteiger modeli bir kez, import sırasında
+# yüklenir; molekül başına yalnızca Setup/ComputeCharges çağrılır. Her worker
+# süreci kendi kopyasını alır, bu yüzden kilit gerekmez.
+if HAS_OPENBABEL_BINDINGS:
+    _FF = ob.OBForceField.FindForceField('MMFF94s')
+    _GASTEIGER = ob.OBChargeModel.FindType('gasteiger')
+    # Format eklentileri, atom yarıçapı ve aromatiklik tabloları ilk
+    # kullanımda yüzlerce küçük dosya açılışıyla keşfedilir; tek atomlu bir
+    # kukla dönüşümle bu keşif işçi başına bir kez, burada ödenir. fork ile
+    # havuz işçileri sıcak durumu olduğu gibi devralır.
+    try:
+        pybel.readstring('smi', 'C').make3D(forcefield='mmff94s', steps=0)
+    except Exception:
+        pass
+else:
+    _FF = None
+    _GASTEIGER = None
+
+# obabel'in mutlak yolu bir kez çözülür: her spawn'da $PATH taraması
+# yapılmaz. (posix_spawn hızlı yolu burada devrede değil: _run çocuğu
+# start_new_session=True ile kendi sürecinde başlatır ve close_fds
+# varsayılanı True'dur, dolayısıyla her spawn fork+exec kullanır.)
+_OBABEL = shutil.which('obabel') or 'obabel'
+
+# Kanonik SMILES -> PDBQT önbelleği: satıcı birleştirmelerinden gelen
+# yinelenen yapılar için 3D üretim + minimizasyon tekrarlanmaz. İşçi süreci
+# başına tutulur ve LRU olarak sınırlandırılır.
+_PDBQT_CACHE = OrderedDict()
+_PDBQT_CACHE_MAX = 100000
+
+# Strateji başına (steepest descent, conjugate gradient) adım sayıları
+MINIMIZATION_STEPS = {
+    "fast": (0, 500),
+    "balanced": (500, 1000),
+    "thorough": (1000, 2000),
+}
+
+# Subprocess yedeği için strateji başına obabel argümanları bir kez, veri
+# olarak kurulur; çağrı başına liste/str üretimi sıcak yoldan çıkar
+_STRATEGY_ARGS = {
+    strategy: ('--minimize', '--ff', 'MMFF94s', '--steps', str(sd + cg),
+               '--cg' if strategy == "fast" else '--sd')
+    for strategy, (sd, cg) in MINIMIZATION_STEPS.items()
+}
+
+# Protonasyon tek geçişte: -p 7.4 pH algısıyla hidrojen ekler, ayrıca
+# -h vermek aynı işi ikinci kez tetiklerdi
+_PDBQT_ARGS = ('-p', '7.4', '--partialcharge', 'gasteiger')
+
+# V2000 atom bloğunda geçerli sayılan element sembolleri; bilinmeyen bir
+# sembol obabel'i dakikalarca bekletmek yerine mikrosaniyede reddedilir
+_PERIODIC = frozenset(
+    "H He Li Be B C N O F Ne Na Mg Al Si P S Cl Ar K Ca Sc Ti V Cr Mn Fe Co Ni Cu Zn "
+    "Ga Ge As Se Br Kr Rb Sr Y Zr Nb Mo Tc Ru Rh Pd Ag Cd In Sn Sb Te I Xe Cs Ba La "
+    "Ce Pr Nd Pm Sm Eu Gd Tb Dy Ho Er Tm Yb Lu Hf Ta W Re Os Ir Pt Au Hg Tl Pb Bi Po "
+    "At Rn Fr Ra Ac Th Pa U Np Pu Am Cm Bk Cf Es Fm Md No Lr Rf Db Sg Bh Hs Mt Ds Rg "
+    "Cn Nh Fl Mc Lv Ts Og D T".split()
+)
+
+# RDKit MMFF optimizasyonu için strateji başına yineleme sınırı
+MMFF_MAX_ITERS = {"fast": 200, "balanced": 500, "thorough": 2000}
+
+# Ligand başına varsayılan duvar saati bütçesi (saniye); --budget-seconds
+# ile değiştirilebilir. Ağır atom başına adım tavanı küçük ligandların
+# dev adım bütçelerinde boşa dönmesini engeller.
+DEFAULT_BUDGET_SECONDS = 960
+STEPS_PER_HEAVY_ATOM = 50
+
+class _BudgetExceeded(Exception):
+    """SIGALRM bekçisinin bütçe dolduğunda fırlattığı iç istisna"""
+
+def _on_budget_alarm(signum, frame):
+    raise _BudgetExceeded
+
+def _run(cmd, timeout):
     """
-    Tek bir SDF dosyas�n�, belirtilen strateji ile PDBQT format�na d�n��t�r�r.
-    T�m �zellikler korunmu�tur.
+    Başarı yolunda çıktıyı ayırmadan subprocess çalıştırır.
+
+    stdout hiç toplanmaz ve stderr bytes olarak bırakılır; büyük bir
+    koşuda obabel'in log gevezeliğini her ligand için UTF-8'e çözmek yerine
+    yalnızca hata durumunda çözülür. Çocuk kendi oturumunda başlatılır ve
+    zaman aşımında tüm süreç grubu SIGKILL ile indirilir — obabel'in
+    yerel kodda asılı kalan ya da yardımcı süreç bırakan vakaları paralel
+    koşuda çekirdek yemeye devam edemez.
     """
-    input_file = Path(input_sdf)
-    output_file = Path(output_pdbqt)
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                            start_new_session=True)
+    try:
+        _, stderr = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        proc.wait()
+        raise
+    return subprocess.CompletedProcess(cmd, proc.returncode, None, stderr)
 
-    # 1. �ZELL�K KORUNDU: �zerine Yazma (Overwrite) Modu
-    if not overwrite and output_file.exists() and output_file.stat().st_size > 0:
-        # print(f"Skipping existing file: {output_file.name}") # Iste�e ba�l�: �ok fazla log �retir
-        return True
+def _stderr_text(result):
+    """Başarısız bir _run sonucunun stderr'ini loglamak için çözer"""
+    return result.stderr.decode('utf-8', 'replace').strip()
 
-    # ��kt� klas�r�n�n var oldu�undan emin ol
-    output_file.parent.mkdir(parents=True, exist_ok=True)
-    
-    # Her i�lem i�in benzersiz ge�ici dosya ad�
-    temp_3d_file = output_file.with_suffix(f'.{input_file.stem}.temp.sdf')
+def _nonempty(path):
+    """Dosyanın var ve boş olmadığını tek stat çağrısıyla söyler"""
+    try:
+        return os.stat(path).st_size > 0
+    except OSError:
+        return False
 
+def _quick_validate_sdf(path):
+    """
+    V2000 başlığından atom sayısını ve element sembollerini doğrular.
+
+    Bilinmeyen elementli bir kayıt için gen3D + build denemesi dakikalar
+    sürüp yine de başarısız olur; bu ön kontrol aynı kararı tek okuma ile
+    verir. Hata mesajı döndürür, kayıt geçerli (veya burada
+    çözümlenemeyecek kadar sıra dışı) ise None döner.
+    """
     try:
-        # 2. �ZELL�K KORUNDU: 3D Olu�turma ve Yedek Mekanizma
-        cmd_gen3d = ['obabel', str(input_file), '-O', str(temp_3d_file), '--gen3D', '-h', '--ff', 'MMFF94s']
-        res_gen3d = subprocess.run(cmd_gen3d, capture_output=True, text=True, timeout=180)
-        
-        if not (res_gen3d.returncode == 0 and temp_3d_file.exists() and temp_3d_file.stat().st_size > 0):
-            cmd_build = ['obabel', str(input_file), '-O', str(temp_3d_file), '--build', '-h', '--ff', 'MMFF94s']
-            res_build = subprocess.run(cmd_build, capture_output=True, text=True, timeout=300)
-            if not (res_build.returncode == 0 and temp_3d_file.exists()):
-                logging.error(f"3D GEN FAILED for {input_file.name}: {res_build.stderr.strip() or res_gen3d.stderr.strip()}")
-                return False
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for _ in range(3):
+                next(f)
+            num_atoms = int(next(f)[0:3])
+            if num_atoms <= 0:
+                return "no atoms in counts line"
+            for _ in range(num_atoms):
+                symbol = next(f)[31:34].strip()
+                if symbol not in _PERIODIC:
+                    return f"unknown element '{symbol}'"
+    except (OSError, StopIteration, ValueError):
+        # Başlık beklenen biçimde değilse kararı dönüştürücüye bırak
+        return None
+    return None
 
-        # 3. �ZELL�K KORUNDU: Farkl� Minimizasyon Stratejileri
-        if strategy == "fast":
-            cmds = [['obminimize', '-ff', 'MMFF94s', '-cg', '-n', '500', str(temp_3d_file)]]
-        elif strategy == "thorough":
-            sd_steps, cg_steps = '1000', '2000'
-            cmds = [['obminimize', '-ff', 'MMFF94s', '-sd', '-n', sd_steps, str(temp_3d_file)], ['obminimize', '-ff', 'MMFF94s', '-cg', '-n', cg_steps, str(temp_3d_file)]]
-        else: # "balanced" (varsay�lan)
-            sd_steps, cg_steps = '500', '1000'
-            cmds = [['obminimize', '-ff', 'MMFF94s', '-sd', '-n', sd_steps, str(temp_3d_file)], ['obminimize', '-ff', 'MMFF94s', '-cg', '-n', cg_steps, str(temp_3d_file)]]
-        
-        for cmd in cmds:
-            res = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-            if res.returncode != 0:
-                logging.error(f"MINIMIZATION FAILED for {input_file.name} (strategy: {strategy}): {res.stderr.strip()}")
-                return False
-        
-        # 4. �ZELL�K KORUNDU: PDBQT D�n��t�rme
-        cmd_pdbqt = ['obabel', str(temp_3d_file), '-O', str(output_file), '-p', '7.4', '--partialcharge', 'gasteiger', '-h']
-        res_pdbqt = subprocess.run(cmd_pdbqt, capture_output=True, text=True, timeout=120)
-        if res_pdbqt.returncode != 0:
-            logging.error(f"PDBQT CONVERSION FAILED for {input_file.name}: {res_pdbqt.stderr.strip()}")
+def _embed_with_rdkit(mol, strategy):
+    """
+    pybel molekülünü RDKit ETKDGv3 + MMFF94s ile 3D'ye gömüp geri döndürür.
+
+    Gömme veya optimizasyon başarısızsa None döner ve çağıran OpenBabel
+    make3D yoluna geri düşer; sabit randomSeed koşuları tekrarlanabilir tutar.
+    """
+    try:
+        m = Chem.MolFromMolBlock(mol.write('sdf'), removeHs=False)
+        if m is None:
+            return None
+        m = Chem.AddHs(m)
+        params = AllChem.ETKDGv3()
+        params.randomSeed = 42
+        if AllChem.EmbedMolecule(m, params) != 0:
+            return None
+        AllChem.MMFFOptimizeMolecule(m, mmffVariant='MMFF94s',
+                                     maxIters=MMFF_MAX_ITERS.get(strategy, MMFF_MAX_ITERS["balanced"]))
+        embedded = pybel.readstring('sdf', Chem.MolToMolBlock(m))
+        embedded.title = mol.title
+        return embedded
+    except Exception:
+        return None
+
+def _convert_mol(mol, record_name, output_file, strategy):
+    """
+    Okunmuş tek bir pybel molekülünü süreç içinde PDBQT'ye dönüştürür.
+
+    Subprocess zinciriyle aynı üç aşamayı (3D üretim, kademeli MMFF94s
+    minimizasyonu, pH 7.4 protonasyon + Gasteiger yükleri + PDBQT yazımı)
+    tek OBMol üzerinde çalıştırır; ara SDF dosyası diske hiç yazılmaz.
+    """
+    # Aynı yapı (kanonik SMILES) aynı strateji ile daha önce dönüştürüldüyse
+    # boru hattını atla ve önbellekteki PDBQT'yi ad değişimiyle yaz
+    cache_key = None
+    canonical = mol.write('can').strip().split()
+    if canonical:
+        cache_key = (canonical[0], strategy)
+        cached = _PDBQT_CACHE.get(cache_key)
+        if cached is not None:
+            _PDBQT_CACHE.move_to_end(cache_key)
+            cached_title, pdbqt_text = cached
+            if mol.title and mol.title != cached_title:
+                pdbqt_text = pdbqt_text.replace(f"Name = {cached_title}", f"Name = {mol.title}", 1)
+            output_file.write_text(pdbqt_text)
+            return True
+
+    # 2-3. ÖZELLİKLER KORUNDU: 3D Oluşturma ve Minimizasyon — önce RDKit
+    # ETKDGv3 + MMFF denenir; reddedilen moleküller OpenBabel yoluna düşer
+    embedded = _embed_with_rdkit(mol, strategy) if HAS_RDKIT else None
+    if embedded is not None:
+        mol = embedded
+    else:
+        mol.OBMol.AddHydrogens(False, True, 7.4)
+        mol.make3D(forcefield='mmff94s', steps=50)
+
+        if _FF is None or not _FF.Setup(mol.OBMol):
+            logging.error(f"MINIMIZATION FAILED for {record_name}: MMFF94s setup failed")
+            return False
+        sd_steps, cg_steps = MINIMIZATION_STEPS.get(strategy, MINIMIZATION_STEPS["balanced"])
+        # Adım sayısını molekül boyutuna ölçekle: küçük ligandlar büyük adım
+        # bütçelerinin çok azında yakınsar, kalanı boşa harcanmış CPU olur
+        step_cap = max(STEPS_PER_HEAVY_ATOM, STEPS_PER_HEAVY_ATOM * mol.OBMol.NumHvyAtoms())
+        if sd_steps:
+            _FF.SteepestDescent(min(sd_steps, step_cap))
+        _FF.ConjugateGradients(min(cg_steps, step_cap))
+        _FF.GetCoordinates(mol.OBMol)
+
+    # 4. ÖZELLİK KORUNDU: PDBQT Dönüştürme
+    if _GASTEIGER is not None:
+        _GASTEIGER.ComputeCharges(mol.OBMol)
+    else:
+        mol.calccharges('gasteiger')
+    pdbqt_text = mol.write('pdbqt')
+    if not pdbqt_text.strip():
+        logging.error(f"FINAL PDBQT IS EMPTY for {record_name}")
+        return False
+    output_file.write_text(pdbqt_text)
+
+    if cache_key is not None:
+        _PDBQT_CACHE[cache_key] = (mol.title, pdbqt_text)
+        if len(_PDBQT_CACHE) > _PDBQT_CACHE_MAX:
+            _PDBQT_CACHE.popitem(last=False)
+    return True
+
+def _convert_in_process(input_file, output_file, strategy):
+    """Dosyadaki ilk SDF kaydını okuyup _convert_mol'e aktarır"""
+    mol = next(pybel.readfile('sdf', str(input_file)), None)
+    if mol is None:
+        logging.error(f"READ FAILED for {input_file.name}: could not read molecule from SDF")
+        return False
+    return _convert_mol(mol, input_file.name, output_file, strategy)
+
+def convert_single_file(input_sdf, output_pdbqt, strategy, overwrite, budget=DEFAULT_BUDGET_SECONDS):
+    """
+    Tek bir SDF dosyasını, belirtilen strateji ile PDBQT formatına dönüştürür.
+    Tüm özellikler korunmuştur. budget, ligand başına toplam duvar saati
+    sınırıdır: subprocess aşamaları kalan bütçeyi paylaşır, bağımsız
+    zaman aşımı yığılması olmaz.
+    """
+    # 1. ÖZELLİK KORUNDU: Üzerine Yazma (Overwrite) Modu — tek stat ile ve
+    # herhangi bir dosya sistemi değişikliğinden (mkdir dahil) önce atla
+    if not overwrite and _nonempty(output_pdbqt):
+        return True
+
+    # Çıktı klasörünün var olduğundan emin ol; sıcak yolda pathlib yerine
+    # düz dize işlemleri kullanılır (PurePath kurulumu çağrı başına maliyet)
+    os.makedirs(os.path.dirname(output_pdbqt) or '.', exist_ok=True)
+    input_name = os.path.basename(input_sdf)
+
+    if HAS_OPENBABEL_BINDINGS:
+        # Bütçe süreç içi yolda da geçerlidir: make3D/minimizasyon yerel
+        # kodda asılı kalırsa SIGALRM bekçisi dönüşümü keser ve işçi bir
+        # sonraki liganda geçer. Sinyal yalnızca ana iş parçacığında
+        # kurulabilir; kurulamazsa dönüşüm eski, sınırsız davranışla çalışır.
+        try:
+            old_handler = signal.signal(signal.SIGALRM, _on_budget_alarm)
+            signal.setitimer(signal.ITIMER_REAL, budget)
+        except ValueError:
+            old_handler = None
+        try:
+            return _convert_in_process(Path(input_sdf), Path(output_pdbqt), strategy)
+        except _BudgetExceeded:
+            logging.error(f"TIMEOUT for {input_name}")
             return False
-        
-        if not (output_file.exists() and output_file.stat().st_size > 0):
-            logging.error(f"FINAL PDBQT IS EMPTY for {input_file.name}")
+        except Exception as e:
+            logging.error(f"UNEXPECTED ERROR for {input_name}: {e}")
             return False
+        finally:
+            if old_handler is not None:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                signal.signal(signal.SIGALRM, old_handler)
+
+    # Çöp kayıtları süreç başlatmadan ele: bilinmeyen element içeren bir
+    # SDF, gen3D + build zaman aşımlarını beklemeden burada reddedilir
+    validation_error = _quick_validate_sdf(input_sdf)
+    if validation_error is not None:
+        logging.error(f"INVALID SDF for {input_name}: {validation_error}")
+        return False
+
+    # 2-4. ÖZELLİKLER KORUNDU: 3D üretim, minimizasyon ve PDBQT yazımı tek
+    # obabel çağrısında birleştirildi — ara SDF diske hiç yazılıp geri
+    # okunmaz ve molekül başına 3-4 yerine en fazla 2 süreç başlatılır.
+    tail_args = _STRATEGY_ARGS.get(strategy, _STRATEGY_ARGS["balanced"]) + _PDBQT_ARGS
+
+    deadline = time.monotonic() + budget
+
+    try:
+        cmd_gen3d = [_OBABEL, input_sdf, '-O', output_pdbqt, '--gen3d', *tail_args]
+        res_gen3d = _run(cmd_gen3d, timeout=max(1, deadline - time.monotonic()))
+
+        if not (res_gen3d.returncode == 0 and _nonempty(output_pdbqt)):
+            # Yedek mekanizma: --gen3d başarısızsa daha sistematik --build dene
+            cmd_build = [_OBABEL, input_sdf, '-O', output_pdbqt, '--build', *tail_args]
+            res_build = _run(cmd_build, timeout=max(1, deadline - time.monotonic()))
+            if not (res_build.returncode == 0 and _nonempty(output_pdbqt)):
+                logging.error(f"CONVERSION FAILED for {input_name} (strategy: {strategy}): {_stderr_text(res_build) or _stderr_text(res_gen3d)}")
+                return False
 
     except subprocess.TimeoutExpired:
-        logging.error(f"TIMEOUT for {input_file.name}")
+        logging.error(f"TIMEOUT for {input_name}")
         return False
     except Exception as e:
-        logging.error(f"UNEXPECTED ERROR for {input_file.name}: {e}")
+        logging.error(f"UNEXPECTED ERROR for {input_name}: {e}")
         return False
-    finally:
-        if temp_3d_file.exists():
-            temp_3d_file.unlink()
 
     return True
 
+def _safe_name(name):
+    """Kayıt başlığını dosya adı olarak güvenli bir dizeye indirger"""
+    return re.sub(r'[^\w.-]+', '_', name).strip('_')
+
+def convert_sdf_stream(input_sdf, output_dir, strategy, overwrite):
+    """
+    Çok kayıtlı bir SDF'yi akış halinde kayıt kayıt dönüştürür.
+
+    Satıcı kütüphaneleri tek dosyada binlerce molekül taşır; dosya başına
+    bir süreç yerine kayıtlar tek geçişte okunur ve her kayıt kendi
+    başlığından (yoksa sırasından) adlandırılan bir PDBQT olarak yazılır.
+    Başarısız kayıt sayısını döndürür.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    failed = 0
+
+    if HAS_OPENBABEL_BINDINGS:
+        for i, mol in enumerate(pybel.readfile('sdf', str(input_sdf))):
+            record_name = _safe_name(mol.title) or f"mol_{i}"
+            output_file = output_dir / f"{record_name}.pdbqt"
+            if not overwrite and _nonempty(output_file):
+                continue
+            try:
+                if not _convert_mol(mol, record_name, output_file, strategy):
+                    failed += 1
+            except Exception as e:
+                logging.error(f"UNEXPECTED ERROR for {record_name}: {e}")
+                failed += 1
+        return failed
+
+    # Bağlar yokken kayıtlar $$$$ sınırından ayrılıp tek kayıtlık geçici
+    # dosyalar üzerinden mevcut subprocess yoluna verilir
+    record_lines = []
+    i = 0
+    with open(input_sdf, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            record_lines.append(line)
+            if line.strip() == '$$$$':
+                record_name = _safe_name(record_lines[0].strip()) or f"mol_{i}"
+                output_file = output_dir / f"{record_name}.pdbqt"
+                temp_record = output_dir / f".{record_name}.record.sdf"
+                temp_record.write_text(''.join(record_lines))
+                try:
+                    if not convert_single_file(str(temp_record), str(output_file), strategy, overwrite):
+                        failed += 1
+                finally:
+                    try:
+                        os.unlink(temp_record)
+                    except FileNotFoundError:
+                        pass
+                record_lines = []
+                i += 1
+    return failed
+
+def _convert_pair(args):
+    """Pool işçileri için paketlenmiş convert_single_file çağrısı"""
+    in_path, out_path, strategy, overwrite, budget = args
+    return convert_single_file(in_path, out_path, strategy, overwrite, budget)
+
+def convert_many(pairs, strategy, overwrite, jobs=1, budget=DEFAULT_BUDGET_SECONDS):
+    """
+    Birden çok (girdi, çıktı) çiftini tek interpreter içinde dönüştürür.
+
+    Python başlatma, OpenBabel eklenti kaydı ve MMFF parametre yüklemesi
+    çağrı başına değil, süreç başına bir kez ödenir; _FF/_GASTEIGER tüm
+    moleküller arasında paylaşılır. jobs > 1 ile çiftler çekirdek başına
+    bir işçiye dağıtılır; fork ile her işçi modül düzeyindeki kuvvet alanı
+    önbelleğini hazır devralır. Başarısız dönüşüm sayısını döndürür.
+    """
+    jobs = min(jobs, len(pairs)) if pairs else 1
+    if jobs > 1:
+        tasks = [(in_path, out_path, strategy, overwrite, budget) for in_path, out_path in pairs]
+        chunksize = max(1, min(32, len(tasks) // jobs))
+        # mp.Pool bir işçi öldüğünde kaybolan görevin sonucunu sonsuza dek
+        # bekler; ProcessPoolExecutor aynı durumda BrokenProcessPool
+        # fırlatır. Teslim edilemeyen görevler başarısız sayılır ve çağıran
+        # askıda kalmak yerine bir sayıyla döner.
+        failed = 0
+        delivered = 0
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=mp.get_context('fork')) as executor:
+            try:
+                for ok in executor.map(_convert_pair, tasks, chunksize=chunksize):
+                    delivered += 1
+                    if not ok:
+                        failed += 1
+            except BrokenProcessPool:
+                lost = len(tasks) - delivered
+                logging.error(f"WORKER DIED: counting {lost} undelivered conversions as failed")
+                failed += lost
+        return failed
+
+    failed = 0
+    for in_path, out_path in pairs:
+        if not convert_single_file(in_path, out_path, strategy, overwrite, budget):
+            failed += 1
+    return failed
+
+def _read_pair_list(list_file):
+    """
+    Satır başına sekmeyle ayrılmış `girdi<TAB>çıktı` çiftlerini okur.
+
+    Sekme içermeyen bir satır tüm koşuyu düşürmek yerine loglanıp atlanır;
+    geçerli satırlar işlenmeye devam eder.
+    """
+    pairs = []
+    with open(list_file, 'r', encoding='utf-8') as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                in_path, out_path = line.split('\t', 1)
+            except ValueError:
+                logging.error(f"BAD PAIR on line {lineno} of {list_file}: no tab separator")
+                continue
+            pairs.append((in_path, out_path))
+    return pairs
+
 def main():
-    parser = argparse.ArgumentParser(description="Worker script to convert one SDF to PDBQT.")
-    parser.add_argument("--input-file", required=True, help="Path to the input SDF file.")
-    parser.add_argument("--output-file", required=True, help="Path for the output PDBQT file.")
+    parser = argparse.ArgumentParser(description="Worker script to convert SDF files to PDBQT.")
+    parser.add_argument("--input-file", help="Path to the input SDF file (single-file mode; prefer --input-list for bulk runs).")
+    parser.add_argument("--output-file", help="Path for the output PDBQT file (single-file mode).")
+    parser.add_argument("--output-dir", help="Directory for per-record PDBQT files; streams every record of --input-file.")
+    parser.add_argument("--input-list", help="Path to a file with one tab-separated 'input<TAB>output' pair per line; converts all pairs in one process.")
     parser.add_argument("--strategy", default="balanced", choices=["fast", "balanced", "thorough"], help="Minimization strategy.")
     parser.add_argument("--overwrite", action="store_true", help="Overwrite existing output files.")
-    
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Parallel workers for --input-list mode (default: all cores).")
+    parser.add_argument("--budget-seconds", type=float, default=DEFAULT_BUDGET_SECONDS, help="Total wall-clock budget per ligand shared across pipeline stages.")
+
     args = parser.parse_args()
 
-    success = convert_single_file(args.input_file, args.output_file, args.strategy, args.overwrite)
-    
+    if args.input_list:
+        failed = convert_many(_read_pair_list(args.input_list), args.strategy, args.overwrite, jobs=args.jobs, budget=args.budget_seconds)
+        if failed:
+            logging.error(f"{failed} conversions failed")
+            sys.exit(1)
+        return
+
+    if args.input_file and args.output_dir:
+        failed = convert_sdf_stream(args.input_file, args.output_dir, args.strategy, args.overwrite)
+        if failed:
+            logging.error(f"{failed} records failed")
+            sys.exit(1)
+        return
+
+    if not (args.input_file and args.output_file):
+        parser.error("either --input-list, or --input-file with --output-file/--output-dir, is required")
+
+    success = convert_single_file(args.input_file, args.output_file, args.strategy, args.overwrite, args.budget_seconds)
+
     if not success:
-        sys.exit(1) # Hata durumunda ��k�� kodu 1 ver
+        sys.exit(1) # Hata durumunda çıkış kodu 1 ver
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()